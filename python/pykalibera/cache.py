@@ -0,0 +1,155 @@
+import errno, hashlib, os, tempfile, time
+
+import pykalibera
+from pykalibera.data import numpy
+
+_SUFFIX = ".npy"
+
+class BootstrapCache(object):
+    def __init__(self, directory, max_bytes=None, max_age=None):
+        """A persistent cache of sorted bootstrap distributions, so that
+        re-running an analysis over the same measurements does not resample
+        them again. Each distribution is kept in its own .npy file, named
+        by a hash of everything it depends on (the measurements and reps
+        of the datasets, iterations, engine, seed and max_batch_bytes, and
+        the pykalibera version), and is memory-mapped when read back.
+
+        As the seed is part of the key, only bootstrap runs given an
+        explicit seed can use the cache.
+
+        The cache is shared safely by several processes: entries are
+        written to a temporary file and renamed into place.
+
+        Arguments:
+        directory -- Directory to keep the entries in. Created if missing.
+
+        Keyword arguments:
+        max_bytes -- If not None, evict the least recently used entries when
+                     the entries take more than this many bytes.
+        max_age -- If not None, evict entries not used for this many
+                   seconds.
+        """
+
+        if not numpy:
+            raise ImportError("the bootstrap cache needs numpy")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def key(self, kind, l_data, iterations, engine, seed, max_batch_bytes):
+        """The hex digest identifying a distribution."""
+
+        h = hashlib.sha1()
+        h.update(repr((pykalibera.__version__, kind, iterations, engine,
+                seed, max_batch_bytes)))
+        for data in l_data:
+            # Out-of-core data is resampled differently, so it gets different
+            # keys, and is hashed a chunk at a time.
+            h.update(repr((list(data.reps), data.out_of_core)))
+            if data.out_of_core:
+                arrays = (values for _, values in data.chunks())
+            else:
+                arrays = [data.as_array()]
+            for values in arrays:
+                h.update(numpy.ascontiguousarray(values, dtype="d").tostring())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key):
+        """The read-only, memory-mapped distribution stored under key, or
+        None."""
+
+        path = self._path(key)
+        try:
+            array = numpy.load(path, mmap_mode="r")
+        except (IOError, OSError, ValueError):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass # Evicted meanwhile; the mapping stays valid.
+        return array
+
+    def put(self, key, array):
+        """Store array under key, then evict stale entries."""
+
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                numpy.save(f, numpy.asarray(array, dtype="d"))
+            os.rename(tmp, self._path(key))
+        except:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    def fetch(self, kind, l_data, iterations, engine, seed, max_batch_bytes,
+            draw):
+        """The sorted distribution of the statistic kind of l_data, from the
+        cache if present. Otherwise it is computed as draw(0, iterations),
+        sorted and stored."""
+
+        if engine is None:
+            raise ValueError("the bootstrap cache needs a numpy engine")
+        key = self.key(kind, l_data, iterations, engine, seed,
+                max_batch_bytes)
+        array = self.get(key)
+        if array is None:
+            array = numpy.sort(numpy.asarray(draw(0, iterations), dtype="d"))
+            self.put(key, array)
+        return array
+
+    def entries(self):
+        """List of (path, size, last use) of the entries, least recently
+        used first."""
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def evict(self):
+        """Remove the entries older than max_age, then the least recently
+        used ones until the rest fit in max_bytes."""
+
+        entries = self.entries()
+        if self.max_age is not None:
+            cutoff = time.time() - self.max_age
+            for path, _, mtime in entries:
+                if mtime < cutoff:
+                    self._remove(path)
+            entries = [e for e in entries if e[2] >= cutoff]
+        if self.max_bytes is not None:
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def clear(self):
+        """Remove all entries."""
+        for path, _, _ in self.entries():
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
@@ -0,0 +1,203 @@
+from pykalibera.data import ArrayData, Data, MemoCache, memoize, numpy
+from pykalibera.data import BOOTSTRAP_CHUNK_ITERATIONS, DEFAULT_CACHE_SIZE
+from pykalibera.data import DEFAULT_MAX_BATCH_BYTES, _multinomial_counts
+from pykalibera.data import _variance_components
+from pykalibera.columnar import read_header
+
+def _product(reps):
+    count = 1
+    for rep in reps:
+        count *= rep
+    return count
+
+class ChunkedData(Data):
+    out_of_core = True
+
+    def __init__(self, read, reps, chunk_size=None,
+            max_chunk_bytes=DEFAULT_MAX_BATCH_BYTES,
+            cache_size=DEFAULT_CACHE_SIZE):
+        """Like Data, but the measurements are read on demand, a chunk of
+        top level repetitions at a time, so that they need not fit in
+        memory. Each estimator makes one pass over the chunks: the sums of
+        squared deviations of the levels below the top level are
+        accumulated per chunk, and only the means of the top level
+        repetitions are kept.
+
+        Arguments:
+        read -- Function taking (start, stop) and returning the values of
+                top level repetitions start to stop - 1, as a flat sequence
+                or array in index_iterator() order.
+        reps -- List of reps for each level, high to low.
+
+        Keyword arguments:
+        chunk_size -- Number of top level repetitions to read at a time.
+                      Defaults to as many as fit in max_chunk_bytes.
+        max_chunk_bytes -- Upper bound on the size of a chunk, used when
+                           chunk_size is None.
+        cache_size -- As for Data.
+        """
+
+        if not numpy:
+            raise ImportError("ChunkedData requires numpy")
+        self.reps = list(reps)
+        self._read = read
+        self._leaves = _product(self.reps[1:]) # per top level repetition
+        if chunk_size is None:
+            chunk_size = max(1, max_chunk_bytes // (8 * self._leaves))
+        self.chunk_size = chunk_size
+        self._cache = MemoCache(cache_size)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Read a file in the columnar format of pykalibera.columnar a chunk
+        at a time. Keyword arguments are passed on to the constructor."""
+
+        reps, _, offset = read_header(path)
+        leaves = _product(reps[1:])
+        def read(start, stop):
+            with open(path, "rb") as f:
+                f.seek(offset + 8 * leaves * start)
+                return numpy.fromfile(f, dtype="<f8",
+                        count=leaves * (stop - start))
+        return cls(read, reps, **kwargs)
+
+    def chunks(self):
+        """Yields (start, values) for each chunk, values being an array
+        shaped ([number of top level repetitions in the chunk] + reps[1:])
+        holding top level repetitions start onwards."""
+
+        for start in range(0, self.reps[0], self.chunk_size):
+            stop = min(start + self.chunk_size, self.reps[0])
+            values = numpy.asarray(self._read(start, stop), dtype="d")
+            if values.size != (stop - start) * self._leaves:
+                raise ValueError("expected %d values for top level "
+                        "repetitions %d to %d, got %d" % ((stop - start) *
+                        self._leaves, start, stop - 1, values.size))
+            yield start, values.reshape([stop - start] + self.reps[1:])
+
+    def __getitem__(self, indicies):
+        assert len(indicies) == len(self.reps)
+        top = indicies[0]
+        values = numpy.asarray(self._read(top, top + 1), dtype="d")
+        return float(values.reshape(self.reps[1:])[tuple(indicies[1:])])
+
+    def as_array(self):
+        """Return all measurements as a numpy array shaped by reps. This
+        reads everything into memory, which the bootstrap methods avoid."""
+        return numpy.asarray(self._read(0, self.reps[0]),
+                dtype="d").reshape(self.reps)
+
+    @memoize
+    def _reduce(self):
+        """One pass over the chunks, giving the means of the top level
+        repetitions and the sums of squared deviations of the levels below
+        the top level (the first being for level 1)."""
+
+        top_means = numpy.empty(self.reps[0])
+        sums = [0.0] * (self.n - 1)
+        for start, means in self.chunks():
+            for i in range(self.n - 1):
+                parents = means.mean(axis=-1)
+                sums[i] += ((means - parents[..., numpy.newaxis]) ** 2).sum()
+                means = parents
+            top_means[start:start + len(means)] = means
+        return top_means, sums
+
+    @memoize
+    def collapse(self, levels):
+        """As Data.collapse(), giving an ArrayData held in memory, built in
+        one pass over the chunks."""
+
+        if levels < 1:
+            raise ValueError("need to keep at least one level")
+        if levels >= self.n:
+            return self
+        if levels == 1:
+            return ArrayData(self._reduce()[0], self.reps[:1])
+        means = numpy.empty(self.reps[:levels])
+        for start, values in self.chunks():
+            shape = [len(values)] + self.reps[1:levels] + [-1]
+            means[start:start + len(values)] = \
+                    values.reshape(shape).mean(axis=-1)
+        return ArrayData(means, self.reps[:levels])
+
+    @memoize
+    def mean(self, indicies=()):
+        """Compute the mean across a number of values.
+
+        Keyword arguments:
+        indicies -- tuple of fixed indicies over which to compute the mean,
+        given from left to right. The remaining indicies are variable."""
+
+        if not indicies:
+            return float(self._reduce()[0].mean())
+        top = indicies[0]
+        values = numpy.asarray(self._read(top, top + 1), dtype="d")
+        return float(values.reshape(self.reps[1:])[tuple(indicies[1:])].mean())
+
+    @memoize
+    def variance_components(self):
+        """Compute S_i^2 and T_i^2 for all levels in one pass over the
+        chunks. See Data.variance_components()."""
+
+        top_means, sums = self._reduce()
+        top_sum = ((top_means - top_means.mean()) ** 2).sum()
+        return _variance_components(self.reps, sums + [top_sum])
+
+    def _draw_bootstrap_means(self, start, iterations, engine, seed,
+            max_batch_bytes, workers, stream=0):
+        """The unsorted simulated means for the resamplings numbered start to
+        start + iterations, drawn in one pass over the chunks.
+
+        Only the "weights" engine is supported. The top level counts of each
+        chunk of iterations are drawn as by that engine, and the counts of
+        the levels below from a random stream of each top level repetition,
+        so the result for a seed does not depend on chunk_size. It differs
+        from that of the in-memory engine, which draws the counts of all
+        top level repetitions from one stream, but has the same
+        distribution.
+
+        This is also used when self is resampled alongside other Data, e.g.
+        by bootstrap_quotient() or bootstrap_geomean()."""
+
+        if engine != "weights":
+            raise ValueError("ChunkedData only supports the weights engine")
+        if workers is not None:
+            raise ValueError("ChunkedData does not support workers")
+        if start % BOOTSTRAP_CHUNK_ITERATIONS != 0:
+            raise ValueError("start must be a multiple of %d" %
+                    BOOTSTRAP_CHUNK_ITERATIONS)
+
+        top_rep = self.reps[0]
+        first_chunk = start // BOOTSTRAP_CHUNK_ITERATIONS
+        batch = max(1, max_batch_bytes // (24 * self._leaves))
+        sums = numpy.zeros(iterations)
+        for top_start, values in self.chunks():
+            flat = values.reshape(len(values), -1)
+            for chunk_start in range(0, iterations,
+                    BOOTSTRAP_CHUNK_ITERATIONS):
+                size = min(BOOTSTRAP_CHUNK_ITERATIONS,
+                        iterations - chunk_start)
+                chunk_index = first_chunk + \
+                        chunk_start // BOOTSTRAP_CHUNK_ITERATIONS
+                rng = numpy.random.RandomState([seed, stream, chunk_index])
+                top = _multinomial_counts(rng,
+                        numpy.repeat(top_rep, size), top_rep)
+                for t in range(len(values)):
+                    rng = numpy.random.RandomState(
+                            [seed, stream, chunk_index, top_start + t])
+                    for lo in range(0, size, batch):
+                        hi = min(lo + batch, size)
+                        counts = top[lo:hi, top_start + t]
+                        for rep in self.reps[1:]:
+                            counts = _multinomial_counts(rng, counts * rep,
+                                    rep)
+                        sums[chunk_start + lo:chunk_start + hi] += \
+                                numpy.dot(counts.reshape(hi - lo, -1),
+                                          flat[t])
+        return sums / float(top_rep * self._leaves)
+
+    def _bootstrap_sample(self):
+        # Resampling one value at a time would read a top level repetition
+        # per value.
+        raise ValueError("ChunkedData only supports the weights engine")
@@ -0,0 +1,132 @@
+"""A compact binary file format for measurements, which is loaded by
+memory-mapping rather than parsing, so that many analysis processes can
+share one page-cache-backed copy of a large run.
+
+A file is laid out as:
+
+    magic       8 bytes, "KALIBERA"
+    version     little-endian uint32, FORMAT_VERSION
+    length      little-endian uint32, length of the header
+    header      JSON object: "reps" (high to low) and "metadata"
+    padding     spaces, up to a multiple of ALIGNMENT bytes
+    values      little-endian float64 values in index_iterator() order
+"""
+
+import json, os, struct
+
+from pykalibera.data import ArrayData, DEFAULT_CACHE_SIZE, numpy
+
+MAGIC = b"KALIBERA"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+_DTYPE = "<f8"
+
+def _product(reps):
+    count = 1
+    for rep in reps:
+        count *= rep
+    return count
+
+class ColumnarWriter(object):
+    def __init__(self, path, reps, metadata=None):
+        """Writes measurements to path in the columnar format a chunk at a
+        time, so that a run need not be held in memory to be converted.
+
+        Arguments:
+        path -- File to create.
+        reps -- List of reps for each level, high to low.
+
+        Keyword arguments:
+        metadata -- JSON-serialisable dict stored in the header, e.g. the
+                    benchmark and VM names.
+        """
+
+        self.reps = [int(rep) for rep in reps]
+        self.count = _product(self.reps)
+        self.written = 0
+        header = json.dumps({"reps": self.reps, "metadata": metadata or {}},
+                sort_keys=True).encode("utf-8")
+        padding = -(_PREAMBLE.size + len(header)) % ALIGNMENT
+        self._file = open(path, "wb")
+        self._file.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION,
+                len(header) + padding))
+        self._file.write(header + b" " * padding)
+
+    def write(self, values):
+        """Append a sequence of values, in index_iterator() order."""
+
+        values = numpy.ascontiguousarray(values, dtype=_DTYPE).reshape(-1)
+        if self.written + len(values) > self.count:
+            raise ValueError("more than the %d values reps allow" %
+                    self.count)
+        values.tofile(self._file)
+        self.written += len(values)
+
+    def close(self):
+        """Finish the file. Raises ValueError if values are missing."""
+
+        if self._file.closed:
+            return
+        self._file.close()
+        if self.written != self.count:
+            raise ValueError("expected %d values, %d written" %
+                    (self.count, self.written))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is None:
+            self.close()
+        else:
+            self._file.close()
+
+def write_data(path, data, metadata=None):
+    """Write a Data (or ArrayData) to path in the columnar format.
+
+    Keyword arguments:
+    metadata -- As for ColumnarWriter.
+    """
+
+    with ColumnarWriter(path, data.reps, metadata) as writer:
+        writer.write(data.as_array())
+
+def read_header(path):
+    """Return (reps, metadata, offset of the values) of the file at path."""
+
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise ValueError("%s: not a columnar measurement file" % path)
+        magic, version, length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError("%s: not a columnar measurement file" % path)
+        if version != FORMAT_VERSION:
+            raise ValueError("%s: unsupported format version %d" %
+                    (path, version))
+        header = json.loads(f.read(length).decode("utf-8"))
+    return header["reps"], header["metadata"], _PREAMBLE.size + length
+
+def load_data(path, cache_size=DEFAULT_CACHE_SIZE):
+    """Memory-map the file at path and return (data, metadata), where data
+    is an ArrayData over the mapped values: nothing is copied or parsed, and
+    pages are only read as the values are used.
+
+    Keyword arguments:
+    cache_size -- As for Data.
+    """
+
+    reps, metadata, offset = read_header(path)
+    count = _product(reps)
+    if os.path.getsize(path) < offset + 8 * count:
+        raise ValueError("%s: truncated" % path)
+    if count:
+        # A plain ndarray view of the mapping, so that reductions give
+        # plain arrays and scalars rather than memmap instances.
+        values = numpy.memmap(path, dtype=_DTYPE, mode="r", offset=offset,
+                shape=(count, )).view(numpy.ndarray)
+    else:
+        values = numpy.empty(0, dtype=_DTYPE)
+    return ArrayData(values, reps, dtype=_DTYPE, cache_size=cache_size), \
+        metadata
@@ -0,0 +1,98 @@
+import zlib
+
+from pykalibera.data import DEFAULT_MAX_BATCH_BYTES, confidence_slice
+from pykalibera.data import numpy, _bootstrap_distributions, _bootstrap_seed
+from pykalibera.data import _quotients
+
+def _stream(key):
+    """A stable random stream number for a dataset key, so a dataset's
+    bootstrap distribution does not depend on which others are compared."""
+    return zlib.crc32(repr(key)) & 0xffffffff
+
+class BootstrapComparison(object):
+    def __init__(self, datasets, iterations=10000, engine="weights", seed=None,
+            max_batch_bytes=DEFAULT_MAX_BATCH_BYTES, workers=None):
+        """Compares many VMs on many benchmarks by bootstrap method, drawing
+        the bootstrap distribution of the mean of each dataset only once.
+        The quotients of every pair of VMs, and their geometric means over
+        benchmarks, are then derived from these distributions, so the cost
+        grows with the number of datasets rather than the number of pairs.
+
+        Each dataset is resampled from its own random streams, seeded from
+        seed and its key, so its distribution, and any comparison involving
+        it, is reproducible whatever the other datasets are.
+
+        Arguments:
+        datasets -- Dict mapping (vm, benchmark) pairs to Data instances.
+
+        Keyword arguments:
+        iterations -- Number of resamplings of each dataset. Default is 10000.
+        engine -- The numpy bootstrap engine, see Data.bootstrap_means().
+        seed, max_batch_bytes, workers -- As for Data.bootstrap_means().
+        """
+
+        self.iterations = iterations
+        self.seed = _bootstrap_seed(engine, seed)
+        keys = sorted(datasets)
+        distributions = _bootstrap_distributions(
+                [datasets[key] for key in keys], iterations, engine,
+                self.seed, max_batch_bytes, workers,
+                streams=[_stream(key) for key in keys])
+        self._means = dict(zip(keys, distributions))
+        self.vms = sorted(set(vm for vm, _ in keys))
+        self.benchmarks = sorted(set(benchmark for _, benchmark in keys))
+
+    def bootstrap_means(self, key):
+        """The (unsorted) array of bootstrap means of the dataset at key."""
+        return self._means[key]
+
+    def _quotients(self, vm_a, vm_b, benchmark):
+        return _quotients(self._means[vm_a, benchmark],
+                          self._means[vm_b, benchmark])
+
+    def quotient(self, vm_a, vm_b, benchmark, confidence="0.95"):
+        """Confidence interval for the quotient of the means of vm_a and
+        vm_b on benchmark, as Data.bootstrap_quotient()."""
+        return confidence_slice(self._quotients(vm_a, vm_b, benchmark),
+                confidence)
+
+    def quotient_matrix(self, benchmark, confidence="0.95"):
+        """Dict mapping every (vm_a, vm_b) pair of distinct VMs that ran
+        benchmark to the confidence interval of their quotient."""
+
+        vms = [vm for vm in self.vms if (vm, benchmark) in self._means]
+        return dict(((a, b), self.quotient(a, b, benchmark, confidence))
+                for a in vms for b in vms if a != b)
+
+    def common_benchmarks(self, vm_a, vm_b):
+        return [benchmark for benchmark in self.benchmarks
+                if (vm_a, benchmark) in self._means and
+                   (vm_b, benchmark) in self._means]
+
+    def geomean(self, vm_a, vm_b, benchmarks=None, confidence="0.95"):
+        """Confidence interval for the geometric mean over benchmarks of the
+        quotients of vm_a and vm_b, as bootstrap_geomean().
+
+        Keyword arguments:
+        benchmarks -- The benchmarks to take into account. Defaults to those
+                      both VMs ran.
+        """
+
+        if benchmarks is None:
+            benchmarks = self.common_benchmarks(vm_a, vm_b)
+        if not benchmarks:
+            raise ValueError("no benchmarks to compare")
+        logs = numpy.zeros(self.iterations)
+        with numpy.errstate(divide="ignore"):
+            for benchmark in benchmarks:
+                logs += numpy.log(self._quotients(vm_a, vm_b, benchmark))
+        return confidence_slice(numpy.exp(logs / len(benchmarks)), confidence)
+
+    def geomean_matrix(self, confidence="0.95"):
+        """Dict mapping every (vm_a, vm_b) pair of distinct VMs to the
+        confidence interval of the geometric mean of their quotients over
+        the benchmarks both ran."""
+
+        return dict(((a, b), self.geomean(a, b, confidence=confidence))
+                for a in self.vms for b in self.vms
+                if a != b and self.common_benchmarks(a, b))
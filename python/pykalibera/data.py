@@ -1,10 +1,43 @@
 import math, itertools, random
 
-import bz2
+import collections
 
 from functools import wraps
 
-constants = bz2.decompress("""\
+class _LazyModule(object):
+    """Stands in for an optional module, which is only imported when one of
+    its attributes is first used. It is false if the module is missing."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = False # Not imported yet.
+
+    def _load(self):
+        if self._module is False:
+            try:
+                self._module = __import__(self._name)
+            except ImportError:
+                self._module = None
+        return self._module
+
+    def __nonzero__(self):
+        return self._load() is not None
+
+    __bool__ = __nonzero__
+
+    def __getattr__(self, attr):
+        module = self._load()
+        if module is None:
+            raise ImportError("%s is not installed" % self._name)
+        return getattr(module, attr)
+
+# numpy takes longer to import than the rest of pykalibera, and many uses
+# of Data do not need it.
+numpy = _LazyModule("numpy")
+
+# The 95% quantiles of Student's t distribution for 1 to 1000 degrees of
+# freedom, decoded by student_t_quantiles() on first use.
+_T_QUANTILES_BZ2 = """\
 QlpoOTFBWSZTWbTS4VUAC9bYAEAQAAF/4GAOGZ3e40HH2YJERUKomGbCNMAAtMBaAkCOP9U0/R+q
 qNCqfjAqVGOY3+qk96qmmIp+CCVNDD/1VGjfqkBJpIElG6uN92vE/PP+5IxhMIIgAbOxEMKLMVSq
 VWtZmZaEklAAAttoAAAAAAAAAAAAEklAAEklABttkksklkkknVu2dX1vW9yWrkuXJJJJJJJJJJKK
@@ -47,12 +80,26 @@ rJBfbPMSKZc3wmij3ULrhE9nIwoDMp4WAK2GkIKIqrHAK0Bjvo7sA2VZ941ggrwIsfGLZTHvGSZR
 HrTVYQJbJ1e3y6B7LoCh5qyXWO03X5WbxWT0UvY55cyRbhmB8ib6lkhRo5USRAoLFA4WELV93ZV/
 DKh2MIhnIWCPBLEh3FUTBSxJC7h4Z15qTFPTRmpe1Ldj1rlkVnAKHDySryior3OheiTPKZY2GaQ6
 N2YyvJh9wuO75VOarCWLEUdLavAs2RShYOntLrMVabUAyDnTJIQ4deJa92pAWd6KBz+F3JFOFCQt
-NLhVQA==""".decode("base64"))
+NLhVQA=="""
+
+_t_quantiles = None
+
+def student_t_quantiles():
+    """Return the table of the 95% quantiles of Student's t distribution
+    used by student_t_quantile95(), entry i being for i + 1 degrees of
+    freedom. The table is decoded on the first call and shared, so it must
+    not be modified. This replaces the module attribute constants."""
 
-constants = [float(x) for x in constants.split()]
+    global _t_quantiles
+    if _t_quantiles is None:
+        import bz2
+        table = bz2.decompress(_T_QUANTILES_BZ2.decode("base64"))
+        _t_quantiles = [float(x) for x in table.split()]
+    return _t_quantiles
 
 def student_t_quantile95(ndeg):
     """Look up the 95% quantile from constant table."""
+    constants = student_t_quantiles()
     index = ndeg - 1
     if index >= len(constants):
         index = -1 # the quantile converges, we just take the last value
@@ -88,42 +135,221 @@ def confidence_slice(means, confidence="0.95"):
     upper: upper bound of 95% confidence interval
 
     Arguments:
-    means -- the list of means (need not be sorted).
+    means -- the list (or numpy array) of means (need not be sorted).
+    """
+
+    return confidence_slices(means, [confidence])[0]
+
+def confidence_slices(means, confidences):
+    """Like confidence_slice(), but returns a list with a ConfRange for each
+    of the given confidence levels.
+
+    Only the order statistics at the slice bounds and the median are
+    needed, so with numpy they are found by selection (numpy.partition), in
+    linear time, rather than by sorting all the means.
+
+    Arguments:
+    means -- the list (or numpy array) of means (need not be sorted).
+    confidences -- list of required confidences, e.g. ["0.9", "0.95"].
+    """
+
+    slices = []
+    for confidence in confidences:
+        # There may be >1 median indicies, i.e. data is even-sized.
+        lower, middle_indicies, upper = \
+                _confidence_slice_indicies(len(means), confidence)
+        # upper is *exclusive*
+        slices.append((lower, middle_indicies, upper - 1))
+
+    wanted = set()
+    for lower, middle_indicies, upper in slices:
+        wanted.update((lower, upper) + middle_indicies)
+    values = _order_statistics(means, sorted(wanted))
+
+    return [ConfRange(values[lower],
+                      _mean([values[i] for i in middle_indicies]),
+                      values[upper])
+            for lower, middle_indicies, upper in slices]
+
+def _order_statistics(l, indicies):
+    """Returns a dict mapping each of the (sorted) indicies to the value at
+    that index in sorted(l)."""
+
+    if not numpy:
+        # A selection written in Python would be slower than sorting in C.
+        l = sorted(l)
+        return dict((i, l[i]) for i in indicies)
+    partitioned = numpy.partition(l, indicies)
+    return dict((i, partitioned[i].item()) for i in indicies)
+
+# Default maximum number of memoized results kept by each Data instance.
+DEFAULT_CACHE_SIZE = 1024
+
+CacheInfo = collections.namedtuple("CacheInfo",
+        "hits misses evictions maxsize currsize")
+
+class MemoCache(object):
+    """A least recently used cache for the results of memoized methods,
+    counting hits, misses and evictions."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        """Arguments:
+        maxsize -- Maximum number of results kept, None for no limit.
+        """
+
+        self.maxsize = maxsize
+        self._values = collections.OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        """Return the result stored for key, raising KeyError if there is
+        none."""
+
+        try:
+            value = self._values.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        # Re-inserting marks the entry as the most recently used.
+        self._values[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize is not None and self.maxsize <= 0:
+            return
+        self._values[key] = value
+        if self.maxsize is not None and len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all stored results. The counters are kept."""
+        self._values.clear()
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize,
+                len(self._values))
+
+def _cache_key(value):
+    """Normalise a memoized method argument into something hashable, so
+    that e.g. costs given as a list or as a tuple share a cache entry."""
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_cache_key(x) for x in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _cache_key(v)) for k, v in value.items()))
+    if hasattr(value, "tolist"): # numpy arrays and scalars, array.array
+        return _cache_key(value.tolist())
+    return value
+
+class AdaptiveConfRange(ConfRange):
+    """A ConfRange computed by adaptive_confidence_slice(), which also
+    records the number of iterations it used and the estimated Monte-Carlo
+    error of its endpoints."""
+
+    def __new__(cls, lower, median, upper, iterations, endpoint_error):
+        self = ConfRange.__new__(cls, lower, median, upper)
+        self.iterations = iterations
+        self.endpoint_error = endpoint_error
+        return self
+
+# Default minimum number of rounds of adaptive_confidence_slice().
+DEFAULT_MIN_ROUNDS = 5
+
+def _stddev(l):
+    mean = _mean(l)
+    return (math.fsum((x - mean) ** 2 for x in l) / (len(l) - 1)) ** 0.5
+
+def adaptive_confidence_slice(draw, max_iterations, confidence="0.95",
+        tolerance=0.01, round_iterations=1000,
+        min_rounds=DEFAULT_MIN_ROUNDS):
+    """Computes a confidence_slice() over bootstrap statistics drawn in
+    rounds, stopping as soon as its endpoints have converged. Returns an
+    AdaptiveConfRange.
+
+    The Monte-Carlo error of the endpoints is estimated by batch means: the
+    endpoints of each round on its own spread around the overall ones, and
+    their standard deviation divided by the square root of the number of
+    rounds estimates the standard error of the overall endpoints. With few
+    rounds this estimate is itself noisy (with two, it is just the distance
+    between two endpoints) and often too small, so the rounds only stop
+    after min_rounds rounds, once the estimate has been within tolerance
+    for two consecutive rounds.
+
+    Arguments:
+    draw -- Function taking (start, count) and returning a list of count
+            more bootstrap statistics, start being the number drawn so far.
+    max_iterations -- Hard cap on the number of statistics drawn.
+
+    Keyword arguments:
+    confidence -- The required confidence. Default is "0.95" (95%).
+    tolerance -- Stop once the estimated error of both endpoints is at most
+                 tolerance times the magnitude of the median.
+    round_iterations -- Number of statistics drawn per round.
+    min_rounds -- Minimum number of rounds before stopping, at least 3.
     """
 
-    means = sorted(means)
-    # There may be >1 median indicies, i.e. data is even-sized.
-    lower, middle_indicies, upper = _confidence_slice_indicies(len(means), confidence)
-    median = _mean([means[i] for i in middle_indicies])
-    return ConfRange(means[lower], median, means[upper - 1]) # upper is *exclusive*
+    if min_rounds < 3:
+        raise ValueError("need at least three rounds to check convergence")
+
+    values = []
+    lowers, uppers = [], []
+    error = float("nan")
+    converged = False
+    while len(values) < max_iterations:
+        new = draw(len(values), min(round_iterations,
+                                    max_iterations - len(values)))
+        values.extend(new)
+        conf = confidence_slice(new, confidence)
+        lowers.append(conf.lower)
+        uppers.append(conf.upper)
+        if len(lowers) < 2:
+            continue
+        error = max(_stddev(lowers), _stddev(uppers)) / len(lowers) ** 0.5
+        median = confidence_slice(values, confidence).median
+        was_converged = converged
+        converged = error <= tolerance * abs(median)
+        if converged and was_converged and len(lowers) >= min_rounds:
+            break
+
+    conf = confidence_slice(values, confidence)
+    return AdaptiveConfRange(conf.lower, conf.median, conf.upper, len(values),
+            error)
 
 def memoize(func):
     """ The @memoize decorator """
     attr = "%s_%s" % (func.func_name, id(func))
     @wraps(func)
     def memoized(self, *args, **kwargs):
-        d = self._memoization_values
-        key = attr, args
+        cache = self._cache
+        key = attr, _cache_key(args), _cache_key(kwargs)
         try:
-            return d[key]
+            return cache.get(key)
         except KeyError:
-            res = d[key] = func(self, *args, **kwargs)
+            res = func(self, *args, **kwargs)
+            cache.put(key, res)
             return res
     return memoized
 
-# Used for index calculation to not get weird float effects.
-# We actually saw some of these effects in our exerimentation.
-from decimal import Decimal, ROUND_UP, ROUND_DOWN
-
-def _confidence_slice_indicies(length, confidence_level=Decimal('0.95')):
+def _confidence_slice_indicies(length, confidence_level='0.95'):
     """Returns a triple (lower, mean_indicies, upper) so that l[lower:upper]
     gives confidence_level of all samples. Mean_indicies is a tuple of one or
     two indicies that correspond to the mean position
 
     Keyword arguments:
-    confidence_level -- desired level of confidence as a Decimal instance.
+    confidence_level -- desired level of confidence as a Decimal instance
+                        or a string.
     """
 
+    # Used for index calculation to not get weird float effects.
+    # We actually saw some of these effects in our exerimentation.
+    # Imported here as the decimal module is slow to import.
+    from decimal import Decimal, ROUND_UP, ROUND_DOWN
+
     assert not isinstance(confidence_level, float)
     confidence_level = Decimal(confidence_level)
     assert isinstance(confidence_level, Decimal)
@@ -151,32 +377,412 @@ def _geomean(l):
     res = 1.0
     for element in l:
         res *= element
+    if (res == 0 or math.isinf(res)) and \
+            all(0 < element < float("inf") for element in l):
+        # The product over- or underflowed, so work in log space instead.
+        return math.exp(math.fsum(math.log(x) for x in l) / len(l))
     return res ** (1.0 / len(l))
 
+def _squared_deviations(blocks, means):
+    """Yields the squared deviation of each value of each block from the
+    mean of its block, appending the means of the blocks to means. Summing
+    these with math.fsum() gives a correctly rounded result, whatever the
+    order of the blocks."""
+
+    for block in blocks:
+        mean = _mean(block)
+        means.append(mean)
+        for value in block:
+            yield (value - mean) ** 2
+
+def _variance_components(reps, sums):
+    """Turns the sums of squared deviations of each level (sums[i - 1] being
+    for level i) into a list of (S_i^2, T_i^2) pairs."""
+
+    n = len(reps)
+    si2 = []
+    for i, sum in enumerate(sums, 1):
+        # self.reps is indexed from the left to right
+        index = n - i
+        if reps[index] == 1:
+            si2.append(float("nan"))
+            continue
+        # 1 / (a * b) = (1 / a) / b, so we compute the factor iteratively.
+        factor = 1.0
+        for rep in reps[:index]:
+            factor /= rep
+        factor /= reps[index] - 1
+        si2.append(factor * float(sum))
+
+    # Note: in the "Rigorous benchmarking in reasonable time" paper, the
+    # expression for T_i^2 was incorrectly shown as being equivalent to:
+    #   Si2(i) - Ti2(i - 1) / r(i - 1)
+    # This has since been corrected in a revised version of the paper, and
+    # we use the revised version below.
+    ti2 = [si2[0]]
+    for i in range(2, n + 1):
+        ti2.append(si2[i - 1] - si2[i - 2] / reps[n - i + 1])
+    return list(zip(si2, ti2))
+
 # ---
 
-class Data(object):
-    def __init__(self, data, reps):
+# Default upper bound on the memory used by one batch of bootstrap
+# iterations in the numpy engines.
+DEFAULT_MAX_BATCH_BYTES = 64 * 1024 * 1024
+
+def _batched_bootstrap_means(array, iterations, rng, max_batch_bytes):
+    """Returns an array of iterations bootstrap means of array (shaped by
+    reps). The resampling indicies of each level are drawn for a whole
+    batch of iterations at once, as an integer matrix, and turned into
+    offsets into the flattened array."""
+
+    flat = array.reshape(-1)
+    # Each leaf of each iteration in a batch needs an offset, a draw and
+    # a gathered value.
+    batch = max(1, min(iterations, max_batch_bytes // (24 * array.size)))
+    means = numpy.empty(iterations)
+    for start in range(0, iterations, batch):
+        size = min(batch, iterations - start)
+        offsets = numpy.zeros(size, dtype=numpy.intp)
+        stride = array.size
+        for rep in array.shape:
+            stride //= rep
+            draws = rng.randint(0, rep, size=offsets.shape + (rep, ))
+            offsets = offsets[..., numpy.newaxis] + draws * stride
+        means[start:start + size] = \
+                flat[offsets].reshape(size, -1).mean(axis=1)
+    return means
+
+def _multinomial_counts(rng, trials, bins):
+    """Throws trials[...] balls uniformly into bins bins, independently for
+    every element of the integer array trials. Returns the counts as an
+    array shaped trials.shape + (bins, ).
+
+    numpy's multinomial only accepts a scalar number of trials, so all the
+    balls are drawn at once and counted per owning element instead."""
+
+    flat = trials.reshape(-1)
+    owners = numpy.repeat(numpy.arange(flat.size) * bins, flat)
+    draws = rng.randint(0, bins, size=owners.size)
+    counts = numpy.bincount(owners + draws, minlength=flat.size * bins)
+    return counts.reshape(trials.shape + (bins, ))
+
+def _weighted_bootstrap_means(array, iterations, rng, max_batch_bytes):
+    """Returns an array of iterations bootstrap means of array (shaped by
+    reps), without building the resampled values.
+
+    A resample's mean is a weighted mean of the original leaves, the weight
+    of a leaf being the number of times it is drawn. A node drawn c times
+    has its r children drawn c * r times in total, uniformly, so the
+    weights are found by drawing multinomial counts level by level."""
+
+    flat = array.reshape(-1)
+    # Each leaf of each iteration in a batch needs a count and the
+    # temporaries of drawing it.
+    batch = max(1, min(iterations, max_batch_bytes // (24 * array.size)))
+    means = numpy.empty(iterations)
+    for start in range(0, iterations, batch):
+        size = min(batch, iterations - start)
+        counts = numpy.ones(size, dtype=numpy.intp)
+        for rep in array.shape:
+            counts = _multinomial_counts(rng, counts * rep, rep)
+        means[start:start + size] = \
+                numpy.dot(counts.reshape(size, -1), flat) / float(flat.size)
+    return means
+
+_BOOTSTRAP_ENGINES = {
+    "batched": _batched_bootstrap_means,
+    "weights": _weighted_bootstrap_means,
+}
+
+# Number of iterations in each independently seeded chunk of work of the
+# numpy engines. This is fixed so that results for a given seed do not
+# depend on how the chunks are spread over worker processes.
+BOOTSTRAP_CHUNK_ITERATIONS = 1000
+
+def _bootstrap_chunk(job, task):
+    """Bootstrap means for one chunk of iterations of one array."""
+
+    arrays, engine, seed, max_batch_bytes = job
+    data_index, stream, chunk_index, iterations = task
+    # Every chunk gets its own stream, seeded from its position.
+    rng = numpy.random.RandomState([seed, stream, chunk_index])
+    return _BOOTSTRAP_ENGINES[engine](arrays[data_index], iterations, rng,
+            max_batch_bytes)
+
+# The job of a worker process, shipped once by _init_bootstrap_worker
+# rather than with every task.
+_worker_job = None
+
+def _init_bootstrap_worker(job):
+    global _worker_job
+    _worker_job = job
+
+def _worker_bootstrap_chunk(task):
+    return _bootstrap_chunk(_worker_job, task)
+
+def _bootstrap_seed(engine, seed):
+    """The seed for the numpy engines. If seed is None, it is drawn from the
+    random module so that random.seed() still makes results reproducible."""
+
+    if engine is not None and seed is None:
+        return random.getrandbits(32)
+    return seed
+
+class _BootstrapRunner(object):
+    def __init__(self, l_data, engine, seed=None,
+            max_batch_bytes=DEFAULT_MAX_BATCH_BYTES, workers=None,
+            streams=None):
+        """Draws bootstrap means of each Data instance in l_data with a numpy
+        engine, in as many calls to draw() as needed, e.g. one per round of
+        adaptive_confidence_slice(). The measurements are turned into arrays
+        once and, with workers, shipped once to a process pool kept until
+        close().
+
+        Keyword arguments:
+        seed -- If None, one is chosen by _bootstrap_seed().
+        workers -- Number of worker processes to spread the chunks of
+                   iterations over. None computes everything in this
+                   process.
+        streams -- List of integers (below 2 ** 32) identifying the random
+                   streams of each Data. Defaults to their positions in
+                   l_data.
+
+        Instances whose measurements are not held in memory (out_of_core,
+        e.g. a ChunkedData) are resampled by their own
+        _draw_bootstrap_means(), in passes over their chunks.
+        """
+
+        if not numpy:
+            raise ImportError("the numpy bootstrap engines require numpy")
+        if engine not in _BOOTSTRAP_ENGINES:
+            raise ValueError("unknown bootstrap engine: %r" % (engine, ))
+        self.l_data = list(l_data)
+        self.engine = engine
+        self.seed = _bootstrap_seed(engine, seed)
+        self.max_batch_bytes = max_batch_bytes
+        self.workers = workers
+        if streams is None:
+            streams = range(len(self.l_data))
+        self.streams = list(streams)
+        self.in_memory = [i for i, data in enumerate(self.l_data)
+                if not data.out_of_core]
+        self.job = [self.l_data[i].as_array() for i in self.in_memory], \
+                engine, self.seed, max_batch_bytes
+        self._pool = None
+
+    def draw(self, iterations, start=0):
+        """Returns a list with an (unsorted) array of iterations bootstrap
+        means for each Data instance.
+
+        Keyword arguments:
+        start -- Number of the first iteration, a multiple of
+                 BOOTSTRAP_CHUNK_ITERATIONS. Drawing n iterations from 0 and
+                 then m more from n gives the same as drawing n + m from 0.
+        """
+
+        if start % BOOTSTRAP_CHUNK_ITERATIONS != 0:
+            raise ValueError("start must be a multiple of %d" %
+                    BOOTSTRAP_CHUNK_ITERATIONS)
+
+        results = [None] * len(self.l_data)
+        for data_index, data in enumerate(self.l_data):
+            if data.out_of_core:
+                results[data_index] = data._draw_bootstrap_means(start,
+                        iterations, self.engine, self.seed,
+                        self.max_batch_bytes, self.workers,
+                        self.streams[data_index])
+
+        first_chunk = start // BOOTSTRAP_CHUNK_ITERATIONS
+        starts = range(0, iterations, BOOTSTRAP_CHUNK_ITERATIONS)
+        tasks = [(array_index, self.streams[data_index],
+                  first_chunk + chunk_index,
+                  min(BOOTSTRAP_CHUNK_ITERATIONS, iterations - chunk_start))
+                 for array_index, data_index in enumerate(self.in_memory)
+                 for chunk_index, chunk_start in enumerate(starts)]
+
+        if self.workers is None:
+            chunks = [_bootstrap_chunk(self.job, task) for task in tasks]
+        else:
+            if self._pool is None:
+                import multiprocessing
+                self._pool = multiprocessing.Pool(self.workers,
+                        _init_bootstrap_worker, (self.job, ))
+            chunks = self._pool.map(_worker_bootstrap_chunk, tasks)
+
+        per_data = len(starts)
+        for i, data_index in enumerate(self.in_memory):
+            results[data_index] = numpy.concatenate(
+                    chunks[i * per_data:(i + 1) * per_data] or
+                    [numpy.empty(0)])
+        return results
+
+    def close(self):
+        """Stop the worker processes, if any."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+def _bootstrap_distributions(l_data, iterations, engine, seed=None,
+        max_batch_bytes=DEFAULT_MAX_BATCH_BYTES, workers=None, start=0,
+        streams=None):
+    """Returns a list with an (unsorted) array of iterations bootstrap means
+    for each Data instance in l_data, computed by a numpy engine in one
+    _BootstrapRunner.draw(). The keyword arguments are as for
+    _BootstrapRunner and its draw()."""
+
+    runner = _BootstrapRunner(l_data, engine, seed, max_batch_bytes, workers,
+            streams)
+    try:
+        return runner.draw(iterations, start)
+    finally:
+        runner.close()
+
+def _check_workers(workers):
+    if workers is not None:
+        raise ValueError("workers needs one of the numpy bootstrap engines")
+
+def _check_cache_seed(cache, seed):
+    # A seed drawn at random would be part of the key of the entry, which
+    # could then never be found again.
+    if cache is not None and seed is None:
+        raise ValueError("a cache needs an explicit seed")
+
+def _check_no_cache(cache):
+    if cache is not None:
+        raise ValueError("a cache cannot be combined with tolerance")
+
+def _resampled(data, levels):
+    """The Data to resample for resample_levels=levels."""
+    return data if levels is None else data.collapse(levels)
+
+def _quotients(a, b):
+    """Elementwise a / b of two arrays, giving inf where b is zero."""
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return numpy.where(b == 0, float("inf"), a / b)
+
+class _Estimators(object):
+    """The estimators derived from variance_components(), shared by Data and
+    the classes computing the same statistics in other ways. Needs the
+    attribute n, and the methods r() and variance_components()."""
+
+    def Si2(self, i):
+        """Biased estimator S_i^2.
+
+        Arguments:
+        i -- the mathematical index of the level from which to compute S_i^2
+        """
+        assert 1 <= i <= self.n
+        return self.variance_components()[i - 1][0]
+
+    def Ti2(self, i):
+        """Compute the unbiased T_i^2 variance estimator.
+
+        Arguments:
+        i -- the mathematical index from which to compute T_i^2.
+        """
+
+        assert 1 <= i <= self.n
+        return self.variance_components()[i - 1][1]
+
+    def optimalreps(self, i, costs, round=True):
+        """Computes the optimal number of repetitions for a given level.
+
+        Arguments:
+        i -- the mathematical level of which to compute optimal reps.
+        costs -- A list of costs for each level, *high* to *low*.
+        round -- When True, the result is rounded (up) to an integral number
+                 of repetitions.
+        """
+
+        costs = [ float(x) for x in costs ]
+        assert 1 <= i < self.n
+        index = self.n - i
+        res_f =  (costs[index - 1] / costs[index] * \
+                  self.Ti2(i) / self.Ti2(i + 1)) ** 0.5
+        return int(math.ceil(res_f)) if round else res_f
+
+    def confidence95(self):
+        """Compute the 95% confidence interval."""
+
+        top_reps = self.r(self.n)
+        return student_t_quantile95(top_reps - 1) * \
+            (self.Si2(self.n) / top_reps) ** 0.5
+
+class Data(_Estimators):
+    # Whether the measurements are read on demand rather than held in
+    # memory, so that they must not be resampled as one array.
+    out_of_core = False
+
+    def __init__(self, data, reps, validate="full",
+            cache_size=DEFAULT_CACHE_SIZE):
         """Instances of this class store measurements (corresponding to
         the Y_... in the papers).
 
         Arguments:
         data -- Dict mapping tuples of all but the last index to lists of values.
         reps -- List of reps for each level, high to low.
+
+        Keyword arguments:
+        validate -- How to check that all data is there. "full" looks up
+                    every single value. "shape" checks in bulk that there is
+                    exactly one list of the right length per index prefix.
+                    "none" trusts the caller.
+        cache_size -- Maximum number of memoized results to keep, the least
+                      recently used being evicted first. None for no limit.
         """
 
         self.data = data
         self.reps = reps
 
-        self._memoization_values = {}
-        # check that all data is there
-        for index in itertools.product(*[range(i) for i in reps]):
-            self[index] # does not crash
+        self._cache = MemoCache(cache_size)
+        if validate == "full":
+            # check that all data is there
+            for index in itertools.product(*[range(i) for i in reps]):
+                self[index] # does not crash
+        elif validate == "shape":
+            self._check_shape()
+        elif validate != "none":
+            raise ValueError("unknown validation: %r" % (validate, ))
+
+    def _check_shape(self):
+        """Checks, without looking at single values, that data maps every
+        index prefix, and nothing else, to a list of reps[-1] values."""
+
+        prefix_reps = self.reps[:-1]
+        length = self.reps[-1]
+        expected = 1
+        for rep in prefix_reps:
+            expected *= rep
+        if len(self.data) != expected:
+            raise ValueError("expected %d lists of values, got %d" %
+                    (expected, len(self.data)))
+        # As there are as many (distinct) keys as prefixes, the keys cover
+        # all prefixes if they are all in range.
+        for prefix, values in self.data.iteritems():
+            if not isinstance(prefix, tuple) or \
+                    len(prefix) != len(prefix_reps) or \
+                    not all(0 <= i < rep
+                            for i, rep in zip(prefix, prefix_reps)):
+                raise ValueError("bad index prefix: %r" % (prefix, ))
+            if len(values) != length:
+                raise ValueError("expected %d values at %r, got %d" %
+                        (length, prefix, len(values)))
 
     def __getitem__(self, indicies):
         assert len(indicies) == len(self.reps)
         return self.data[indicies[:-1]][indicies[-1]]
 
+    def clear_cache(self):
+        """Drop all memoized results."""
+        self._cache.clear()
+
+    def cache_info(self):
+        """Return a CacheInfo with the hits, misses and evictions of the
+        memoization cache, its maximum and its current size."""
+        return self._cache.info()
+
     def index_iterator(self, start=0, stop=None):
         """Computes a list of all possible data indcies gievn that
         start <= index <= stop are fixed."""
@@ -218,51 +824,30 @@ class Data(object):
         return _mean(alldata)
 
     @memoize
-    def Si2(self, i):
-        """Biased estimator S_i^2.
-
-        Arguments:
-        i -- the mathematical index of the level from which to compute S_i^2
-        """
-        assert 1 <= i <= self.n
-        # self.reps is indexed from the left to right
-        index = self.n - i
-        factor = 1.0
-
-        # We compute this iteratively leveraging the fact that
-        # 1 / (a * b) = (1 / a) / b
-        for rep in self.reps[:index]:
-            factor /= rep
-        # Then at this point we have:
-        # factor * (1 / (r_i - 1)) = factor / (r_i - 1)
-        factor /=  self.reps[index] - 1
-
-        # Second line of the above definition, the lines are multiplied.
-        indicies = self.index_iterator(stop=index+1)
-        sum = 0.0
-        for index in indicies:
-            a = self.mean(index)
-            b = self.mean(index[:-1])
-            sum += (a - b) ** 2
-        return factor * sum
+    def variance_components(self):
+        """Compute S_i^2 and T_i^2 for all levels in a single bottom-up pass.
 
-    @memoize
-    def Ti2(self, i):
-        """Compute the unbiased T_i^2 variance estimator.
+        The means of each level are computed once, from the means of the
+        level below, and only the means of one level are held at a time.
+        Returns a list of (S_i^2, T_i^2) pairs, entry i - 1 being for level
+        i. Levels with a single repetition have no variance estimate, and
+        give NaN."""
 
-        Arguments:
-        i -- the mathematical index from which to compute T_i^2.
-        """
+        # Level 1: the deviations of each list from its own mean.
+        means = []
+        lists = (self.data[index]
+                for index in self.index_iterator(stop=self.n - 1))
+        sums = [math.fsum(_squared_deviations(lists, means))]
 
-        assert 1 <= i <= self.n
-        if i == 1:
-            return self.Si2(1)
-        # Note: in the "Rigorous benchmarking in reasonable time" paper, the
-        # expression belown was incorrectly shown as being equivalent to:
-        #   return self.Si2(i) - self.Ti2(i - 1) / self.r(i - 1)
-        # This has since been corrected in a revised version of the paper, and
-        # we use the revised version below.
-        return self.Si2(i) - self.Si2(i - 1) / self.r(i - 1)
+        # Higher levels: the deviations of each block of means from the mean
+        # of that block, which is one mean of the level above.
+        for rep in reversed(self.reps[:-1]):
+            parents = []
+            blocks = (means[start:start + rep]
+                    for start in range(0, len(means), rep))
+            sums.append(math.fsum(_squared_deviations(blocks, parents)))
+            means = parents
+        return _variance_components(self.reps, sums)
 
     @memoize
     def optimalreps(self, i, costs, round=True):
@@ -275,45 +860,142 @@ class Data(object):
                  of repetitions.
         """
 
-        costs = [ float(x) for x in costs ]
-        assert 1 <= i < self.n
-        index = self.n - i
-        res_f =  (costs[index - 1] / costs[index] * \
-                  self.Ti2(i) / self.Ti2(i + 1)) ** 0.5
-        return int(math.ceil(res_f)) if round else res_f
+        return _Estimators.optimalreps(self, i, costs, round)
 
-    def confidence95(self):
-        """Compute the 95% confidence interval."""
+    def as_array(self):
+        """Return the measurements as a numpy array shaped by reps."""
+        return ArrayData(self.data, self.reps).data
+
+    @memoize
+    def collapse(self, levels):
+        """Return a Data of the top levels levels, whose measurements are
+        the means of the index prefixes of length levels. It has the same
+        mean, and resampling it resamples only the top levels of self.
+        Returns self if levels is at least n.
 
-        degfreedom = self.reps[0] - 1
-        return student_t_quantile95(degfreedom) * \
-            (self.Si2(self.n) / self.reps[0]) ** 0.5
+        Arguments:
+        levels -- Number of levels to keep, at least 1.
+        """
 
-    def bootstrap_means(self, iterations=1000):
+        if levels < 1:
+            raise ValueError("need to keep at least one level")
+        if levels >= self.n:
+            return self
+        data = {}
+        for prefix in self.index_iterator(stop=levels - 1):
+            data[prefix] = [_mean([self[prefix + (i, ) + rest]
+                    for rest in self.index_iterator(start=levels)])
+                for i in range(self.reps[levels - 1])]
+        return Data(data, self.reps[:levels], validate="none")
+
+    def bootstrap_means(self, iterations=1000, engine=None, seed=None,
+            max_batch_bytes=DEFAULT_MAX_BATCH_BYTES, workers=None, cache=None,
+            resample_levels=None):
         """Compute a list of simulated means from bootstrap resampling.
 
         Note that, resampling occurs with replacement.
 
         Keyword arguments:
         iterations -- Number of resamples (and thus means) generated.
+        engine -- None resamples one index at a time using the random
+                  module. "batched" draws the indicies for many iterations
+                  at once with numpy. "weights" draws how often each value
+                  is picked instead of the resampled values themselves.
+        seed -- Seed for the numpy engines. If None, one is drawn from the
+                random module.
+        max_batch_bytes -- Upper bound on the memory used by one batch of
+                           iterations in the numpy engines.
+        workers -- Number of processes to spread the iterations of the numpy
+                   engines over. Results for a given seed do not depend on
+                   the number of workers.
+        cache -- A pykalibera.cache.BootstrapCache to keep the means in, so
+                 that they are only computed once for the same data and
+                 arguments. Needs a numpy engine and a seed.
+        resample_levels -- If not None, only resample the top
+                           resample_levels levels, the levels below being
+                           collapsed into their means once with collapse().
+                           E.g. 1 only resamples executions. None resamples
+                           all levels.
         """
-        means = []
-        for i in range(iterations):
-            values = self._bootstrap_sample()
-            means.append(_mean(values))
-        means.sort()
-        return means
+        _check_cache_seed(cache, seed)
+        data = _resampled(self, resample_levels)
+        seed = _bootstrap_seed(engine, seed)
+        def draw(start, count):
+            return data._draw_bootstrap_means(start, count, engine, seed,
+                    max_batch_bytes, workers)
+        if cache is not None:
+            return cache.fetch("means", [data], iterations, engine, seed,
+                    max_batch_bytes, draw).tolist()
+        return sorted(draw(0, iterations))
 
-    def bootstrap_confidence_interval(self, iterations=10000, confidence="0.95"):
+    def bootstrap_confidence_interval(self, iterations=10000, confidence="0.95",
+            engine=None, seed=None, max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+            workers=None, tolerance=None,
+            round_iterations=BOOTSTRAP_CHUNK_ITERATIONS, cache=None,
+            resample_levels=None, min_rounds=DEFAULT_MIN_ROUNDS):
         """Compute a confidence interval via bootstrap method.
 
         Keyword arguments:
         iterations -- Number of resamplings to base result upon. Default is 10000.
         confidence -- The required confidence. Default is "0.95" (95%).
+        engine, seed, max_batch_bytes, workers, cache, resample_levels -- As
+            for bootstrap_means(). A cache cannot be combined with
+            tolerance.
+        tolerance -- If not None, resample in rounds until the estimated
+                     Monte-Carlo error of the interval endpoints is at most
+                     tolerance times the magnitude of the median, with
+                     iterations as a hard cap. An AdaptiveConfRange is
+                     returned. See adaptive_confidence_slice().
+        round_iterations -- Number of resamplings per round. Must be a
+                            multiple of BOOTSTRAP_CHUNK_ITERATIONS with the
+                            numpy engines.
+        min_rounds -- Minimum number of rounds before stopping, with
+                      tolerance.
         """
 
-        means = self.bootstrap_means(iterations)
-        return confidence_slice(means, confidence)
+        _check_cache_seed(cache, seed)
+        data = _resampled(self, resample_levels)
+        seed = _bootstrap_seed(engine, seed)
+        def draw(start, count):
+            return data._draw_bootstrap_means(start, count, engine, seed,
+                    max_batch_bytes, workers)
+        if tolerance is not None:
+            _check_no_cache(cache)
+            if engine is None:
+                return adaptive_confidence_slice(draw, iterations, confidence,
+                        tolerance, round_iterations, min_rounds)
+            # The rounds share one runner, and so one pool of workers.
+            runner = _BootstrapRunner([data], engine, seed, max_batch_bytes,
+                    workers)
+            def draw_round(start, count):
+                return runner.draw(count, start)[0]
+            try:
+                return adaptive_confidence_slice(draw_round, iterations,
+                        confidence, tolerance, round_iterations, min_rounds)
+            finally:
+                runner.close()
+        if cache is not None:
+            means = cache.fetch("means", [data], iterations, engine, seed,
+                    max_batch_bytes, draw)
+            return confidence_slice(means, confidence)
+        return confidence_slice(draw(0, iterations), confidence)
+
+    def _draw_bootstrap_means(self, start, iterations, engine, seed,
+            max_batch_bytes, workers):
+        """The unsorted simulated means for the resamplings numbered start to
+        start + iterations, as a list or, for the numpy engines, an array."""
+
+        if engine is not None:
+            means, = _bootstrap_distributions([self], iterations, engine,
+                    seed, max_batch_bytes, workers, start)
+            return means
+        _check_workers(workers)
+
+        means = []
+        for i in range(iterations):
+            values = self._bootstrap_sample()
+            means.append(_mean(values))
+        return means
 
     def _bootstrap_sample(self):
         # Uses a closure to mimic the abritrary nested loop depth construct
@@ -331,7 +1013,133 @@ class Data(object):
                         yield value
         return list(_random_measurement_sample())
 
-    def bootstrap_quotient(self, other, iterations=10000, confidence='0.95'):
+    def bootstrap_quotient(self, other, iterations=10000, confidence='0.95',
+            engine=None, seed=None, max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+            workers=None, tolerance=None,
+            round_iterations=BOOTSTRAP_CHUNK_ITERATIONS, cache=None,
+            resample_levels=None, min_rounds=DEFAULT_MIN_ROUNDS):
+        """Compute a confidence interval for the quotient of the means of
+        self and other via bootstrap method.
+
+        Keyword arguments:
+        iterations -- Number of resamplings to base result upon. Default is 10000.
+        confidence -- The required confidence. Default is "0.95" (95%).
+        engine, seed, max_batch_bytes, workers, cache, resample_levels -- As
+            for bootstrap_means(). resample_levels applies to both.
+        tolerance, round_iterations, min_rounds -- As for
+            bootstrap_confidence_interval().
+        """
+
+        _check_cache_seed(cache, seed)
+        data = _resampled(self, resample_levels)
+        other = _resampled(other, resample_levels)
+        seed = _bootstrap_seed(engine, seed)
+        def draw(start, count):
+            return data._draw_bootstrap_quotients(other, start, count, engine,
+                    seed, max_batch_bytes, workers)
+        if tolerance is not None:
+            _check_no_cache(cache)
+            if engine is None:
+                return adaptive_confidence_slice(draw, iterations, confidence,
+                        tolerance, round_iterations, min_rounds)
+            # The rounds share one runner, and so one pool of workers.
+            runner = _BootstrapRunner([data, other], engine, seed,
+                    max_batch_bytes, workers)
+            def draw_round(start, count):
+                return _quotients(*runner.draw(count, start))
+            try:
+                return adaptive_confidence_slice(draw_round, iterations,
+                        confidence, tolerance, round_iterations, min_rounds)
+            finally:
+                runner.close()
+        if cache is not None:
+            ratios = cache.fetch("quotient", [data, other], iterations, engine,
+                    seed, max_batch_bytes, draw)
+            return confidence_slice(ratios, confidence)
+        return confidence_slice(draw(0, iterations), confidence)
+
+    def quotient_confidence_interval(self, other, method="fieller",
+            max_denominator_error=0.3, **kwargs):
+        """Compute a 95% confidence interval for the quotient of the means of
+        self and other analytically, from the variance of each mean,
+        S_n^2 / r_n, as used by confidence95(). self and other are taken to
+        be independent.
+
+        Keyword arguments:
+        method -- "fieller" uses Fieller's theorem, which allows for the
+                  skew of a quotient. "delta" uses the delta method, giving
+                  an interval symmetric around the quotient. "auto" uses
+                  Fieller's theorem when its assumptions hold, and
+                  bootstrap_quotient() otherwise: when a top level has a
+                  single repetition, a mean is zero, or the half width of
+                  the 95% confidence interval of the mean of other is more
+                  than max_denominator_error times that mean (or Fieller's
+                  interval is unbounded). That interval uses the t quantile
+                  of Fieller's theorem, whose degrees of freedom depend on
+                  both self and other.
+        max_denominator_error -- See method "auto".
+
+        Other keyword arguments are passed to bootstrap_quotient() in
+        "auto" mode.
+
+        Returns a ConfRange (lower, quotient, upper). Raises ValueError if
+        the interval is unbounded, the mean of other not being
+        significantly different from zero.
+        """
+
+        if method not in ("fieller", "delta", "auto"):
+            raise ValueError("unknown method: %r" % (method, ))
+        auto = method == "auto"
+        if auto:
+            method = "fieller"
+        elif kwargs:
+            raise TypeError("unexpected keyword arguments: %s" %
+                    ", ".join(sorted(kwargs)))
+        a, b = self.mean(), other.mean()
+        if auto and (self.reps[0] < 2 or other.reps[0] < 2 or a == 0 or
+                b == 0):
+            return self.bootstrap_quotient(other, **kwargs)
+
+        if self.reps[0] < 2 or other.reps[0] < 2:
+            raise ValueError("need at least two top level repetitions")
+        var_a = self.Si2(self.n) / self.reps[0]
+        var_b = other.Si2(other.n) / other.reps[0]
+        if b == 0:
+            raise ValueError("the mean of other is zero")
+        q = a / b
+        # Welch-Satterthwaite degrees of freedom of the linearised quotient.
+        v_a, v_b = var_a / b ** 2, q ** 2 * var_b / b ** 2
+        if v_a + v_b == 0:
+            return ConfRange(q, q, q)
+        degfreedom = (v_a + v_b) ** 2 / \
+            (v_a ** 2 / (self.reps[0] - 1) + v_b ** 2 / (other.reps[0] - 1))
+        t = student_t_quantile95(max(1, int(degfreedom)))
+
+        if method == "delta":
+            half = t * (v_a + v_b) ** 0.5
+            return ConfRange(q - half, q, q + half)
+        g = t ** 2 * var_b / b ** 2
+        # g is the square of the relative half width of the interval of b.
+        if auto and g >= min(1.0, max_denominator_error ** 2):
+            return self.bootstrap_quotient(other, **kwargs)
+        if g >= 1:
+            raise ValueError("the mean of other is not significantly "
+                    "different from zero: the interval is unbounded")
+        half = t / abs(b) * (var_a * (1 - g) + q ** 2 * var_b) ** 0.5
+        return ConfRange((q - half) / (1 - g), q, (q + half) / (1 - g))
+
+    def _draw_bootstrap_quotients(self, other, start, iterations, engine, seed,
+            max_batch_bytes, workers):
+        """The unsorted simulated quotients of the means of self and other
+        for the resamplings numbered start to start + iterations, as a list
+        or, for the numpy engines, an array."""
+
+        if engine is not None:
+            means_a, means_b = _bootstrap_distributions([self, other],
+                    iterations, engine, seed, max_batch_bytes, workers, start)
+            return _quotients(means_a, means_b)
+        _check_workers(workers)
+
         ratios = []
         for _ in range(iterations):
             ra = self._bootstrap_sample()
@@ -343,12 +1151,146 @@ class Data(object):
                 ratios.append(float("inf"))
             else:
                 ratios.append(mean_ra / mean_rb)
-        ratios.sort()
-        return confidence_slice(ratios, confidence)
+        return ratios
+
+class ArrayData(Data):
+    def __init__(self, data, reps, dtype="d", cache_size=DEFAULT_CACHE_SIZE):
+        """Like Data, but the measurements are kept in one contiguous
+        N-dimensional numpy array shaped by reps. Means and variance
+        estimators are then computed as axis reductions over the array.
 
-def bootstrap_geomean(l_data_a, l_data_b, iterations=10000, confidence='0.95'):
+        Arguments:
+        data -- Either a dict as accepted by Data, or a flat sequence or
+                buffer of values in index_iterator() order.
+        reps -- List of reps for each level, high to low.
+
+        Keyword arguments:
+        dtype -- numpy type of the stored values. Default is float64.
+        cache_size -- As for Data.
+        """
+
+        if not numpy:
+            raise ImportError("ArrayData requires numpy")
+
+        self.reps = list(reps)
+        if isinstance(data, dict):
+            prefixes = self.index_iterator(stop=self.n - 1)
+            array = numpy.array([data[prefix] for prefix in prefixes],
+                    dtype=dtype)
+        else:
+            array = numpy.asarray(data, dtype=dtype)
+        self.data = array.reshape(self.reps)
+        # Flat view used to gather values by offset when resampling.
+        self._flat = self.data.reshape(-1)
+        self._strides = [int(numpy.prod(self.reps[i + 1:]))
+                for i in range(self.n)]
+
+        self._cache = MemoCache(cache_size)
+
+    @classmethod
+    def from_buffer(cls, buf, reps, dtype="d"):
+        """Build an instance over an existing buffer without copying it.
+
+        Arguments:
+        buf -- Object exposing the buffer interface (e.g. array.array, mmap)
+               holding the values in index_iterator() order.
+        reps -- List of reps for each level, high to low.
+
+        Keyword arguments:
+        dtype -- numpy type of the values in the buffer.
+        """
+
+        if not numpy:
+            raise ImportError("ArrayData requires numpy")
+        return cls(numpy.frombuffer(buf, dtype=dtype), reps, dtype=dtype)
+
+    def __getitem__(self, indicies):
+        assert len(indicies) == len(self.reps)
+        return self.data[tuple(indicies)]
+
+    def as_array(self):
+        """Return the measurements as a numpy array shaped by reps."""
+        return self.data
+
+    @memoize
+    def collapse(self, levels):
+        """As Data.collapse(), giving an ArrayData."""
+
+        if levels < 1:
+            raise ValueError("need to keep at least one level")
+        if levels >= self.n:
+            return self
+        shape = self.reps[:levels] + [-1]
+        return ArrayData(self.data.reshape(shape).mean(axis=-1),
+                self.reps[:levels])
+
+    def mean(self, indicies=()):
+        """Compute the mean across a number of values.
+
+        Keyword arguments:
+        indicies -- tuple of fixed indicies over which to compute the mean,
+        given from left to right. The remaining indicies are variable."""
+
+        return float(self.data[tuple(indicies)].mean())
+
+    @memoize
+    def variance_components(self):
+        """Compute S_i^2 and T_i^2 for all levels in a single bottom-up pass.
+        See Data.variance_components()."""
+
+        means = self.data
+        sums = []
+        for i in range(self.n):
+            parents = means.mean(axis=-1)
+            sums.append(((means - parents[..., numpy.newaxis]) ** 2).sum())
+            means = parents
+        return _variance_components(self.reps, sums)
+
+    def _bootstrap_sample(self):
+        # Draws indicies in the same (depth first) order as
+        # Data._bootstrap_sample, so a given random seed gives the same
+        # resample, but gathers the values from the flat array in one go.
+        offsets = []
+        last = self.n - 1
+        def _draw(level, base):
+            rep = self.reps[level]
+            indicies = [random.randrange(rep) for i in range(rep)]
+            if level == last:
+                offsets.extend([base + i for i in indicies])
+            else:
+                stride = self._strides[level]
+                for single_index in indicies:
+                    _draw(level + 1, base + single_index * stride)
+        _draw(0, 0)
+        return self._flat[offsets]
+
+def bootstrap_geomean(l_data_a, l_data_b, iterations=10000, confidence='0.95',
+        engine=None, seed=None, max_batch_bytes=DEFAULT_MAX_BATCH_BYTES,
+        workers=None, resample_levels=None):
+    """Compute a confidence interval for the geometric mean of the quotients
+    of the means of pairs of Data instances via bootstrap method.
+
+    Arguments:
+    l_data_a -- List of Data instances (the numerators).
+    l_data_b -- List of Data instances (the denominators), matching l_data_a.
+
+    Keyword arguments:
+    iterations -- Number of resamplings to base result upon. Default is 10000.
+    confidence -- The required confidence. Default is "0.95" (95%).
+    engine, seed, max_batch_bytes, workers, resample_levels -- As for
+        Data.bootstrap_means(). resample_levels applies to all instances.
+    """
     if len(l_data_a) != len(l_data_b):
         raise ValueError("lists need to match")
+    l_data_a = [_resampled(data, resample_levels) for data in l_data_a]
+    l_data_b = [_resampled(data, resample_levels) for data in l_data_b]
+
+    if engine is not None:
+        geomeans = _bootstrap_geomeans(l_data_a, l_data_b, iterations, engine,
+                seed, max_batch_bytes, workers)
+        return confidence_slice(geomeans, confidence)
+    _check_workers(workers)
+
     geomeans = []
     for _ in range(iterations):
         ratios = []
@@ -359,5 +1301,33 @@ def bootstrap_geomean(l_data_a, l_data_b, iterations=10000, confidence='0.95'):
             mean_rb = _mean(rb)
             ratios.append(mean_ra / mean_rb)
         geomeans.append(_geomean(ratios))
-    geomeans.sort()
     return confidence_slice(geomeans, confidence)
+
+def _bootstrap_geomeans(l_data_a, l_data_b, iterations, engine, seed,
+        max_batch_bytes, workers):
+    """The (unsorted) array of simulated geometric means of bootstrap_geomean()
+    computed by a numpy engine.
+
+    All benchmarks are resampled for a block of iterations at a time, as
+    large as max_batch_bytes allows, and the geometric means of the block
+    are computed in log space by reductions over a benchmarks x iterations
+    array, which cannot overflow or underflow."""
+
+    l_data = list(l_data_a) + list(l_data_b)
+    chunks = max(1, max_batch_bytes //
+            (8 * len(l_data) * BOOTSTRAP_CHUNK_ITERATIONS))
+    block = chunks * BOOTSTRAP_CHUNK_ITERATIONS
+
+    geomeans = numpy.empty(iterations)
+    runner = _BootstrapRunner(l_data, engine, seed, max_batch_bytes, workers)
+    try:
+        for start in range(0, iterations, block):
+            count = min(block, iterations - start)
+            means = runner.draw(count, start)
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                logs = numpy.log(numpy.array(means[:len(l_data_a)])) - \
+                       numpy.log(numpy.array(means[len(l_data_a):]))
+                geomeans[start:start + count] = numpy.exp(logs.mean(axis=0))
+    finally:
+        runner.close()
+    return geomeans
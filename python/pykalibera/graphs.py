@@ -1,10 +1,83 @@
 class GraphError(Exception): pass
 
-import matplotlib.pyplot as plt
-import matplotlib.mlab as mlab
+import collections
+
+from pykalibera.data import numpy
+
+def _pyplot():
+    # pyplot is slow to import and sets up a GUI backend, so it is only
+    # imported once something is drawn through it.
+    import matplotlib.pyplot as plt
+    return plt
+
+def autocorrelation(data, maxlag=None):
+    """Computes the autocorrelation function of data, demeaned and
+    normalised so that lag 0 has correlation 1, in O(n log n) time using
+    the FFT.
+
+    Arguments:
+    data -- list (or array) of data points
+
+    Keyword arguments:
+    maxlag -- largest lag to compute (None computes all lags up to
+              len(data) - 1)
+
+    Returns (lags, correlations), two numpy arrays for lags 0 to maxlag.
+    """
+
+    values = numpy.asarray(data, dtype=float)
+    n = len(values)
+    if n == 0:
+        raise GraphError("no data")
+    if maxlag is None:
+        maxlag = n - 1
+    maxlag = min(maxlag, n - 1)
+    values = values - values.mean()
+    # Zero padding to at least 2n avoids the circular wrap-around; a power
+    # of two keeps the FFT fast.
+    size = 1 << (2 * n - 1).bit_length()
+    spectrum = numpy.fft.rfft(values, size)
+    acf = numpy.fft.irfft(spectrum * spectrum.conjugate(), size)[:maxlag + 1]
+    if acf[0] != 0:
+        acf = acf / acf[0]
+    return numpy.arange(maxlag + 1), acf
+
+def _downsample(data, buckets):
+    """Reduces data to the minimum and maximum of each of buckets runs of
+    consecutive points, which is all a line plot buckets pixels wide can
+    show. Returns (xs, ys) arrays to plot."""
+
+    values = numpy.asarray(data, dtype=float)
+    n = len(values)
+    if n <= 2 * buckets:
+        return numpy.arange(n), values
+    starts = numpy.linspace(0, n, buckets + 1).astype(int)[:-1]
+    lows = numpy.minimum.reduceat(values, starts)
+    highs = numpy.maximum.reduceat(values, starts)
+    xs = numpy.repeat(starts, 2)
+    ys = numpy.column_stack((lows, highs)).ravel()
+    return xs, ys
+
+def _pixel_width(fig):
+    return int(fig.get_size_inches()[0] * fig.dpi)
+
+def _axes(ax):
+    """The Axes to draw into, cleared: ax, or pyplot's current Axes."""
+    if ax is None:
+        plt = _pyplot()
+        plt.cla()
+        return plt.gca()
+    ax.cla()
+    return ax
+
+def _finish(ax, filename, pyplot):
+    if filename is not None:
+        ax.figure.savefig(filename)
+    elif pyplot:
+        _pyplot().show()
 
 def run_sequence_plot(data, title="Run sequence plot", filename=None,
-        xlabel="Run #", ylabel="Time(s)"):
+        xlabel="Run #", ylabel="Time(s)", buckets=None, ax=None):
     """Plots a run sequence graph.
 
     Arguments:
@@ -15,22 +88,27 @@ def run_sequence_plot(data, title="Run sequence plot", filename=None,
     filename -- filename to write graph to (None plots to screen)
     xlabel -- label on x-axis"
     ylabel -- label on y-axis"
+    buckets -- number of buckets of consecutive points of which only the
+               minimum and maximum are drawn, when there are more than
+               twice as many points (None uses the width of the figure in
+               pixels)
+    ax -- matplotlib Axes to draw into instead of pyplot's current Axes.
+          Nothing is shown if filename is None.
     """
-    xs = range(len(data))
 
-    plt.cla()
-    p = plt.plot(xs, data)
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
+    axes = _axes(ax)
+    if buckets is None:
+        buckets = _pixel_width(axes.figure)
+    xs, ys = _downsample(data, buckets)
 
-    if filename is not None:
-        plt.savefig(filename)
-    else:
-        plt.show()
+    axes.plot(xs, ys)
+    axes.set_title(title)
+    axes.set_xlabel(xlabel)
+    axes.set_ylabel(ylabel)
+    _finish(axes, filename, ax is None)
 
 def lag_plot(data, lag=5, filename=None,
-        title=None, xlabel="Lag time(s)", ylabel="Time(s)"):
+        title=None, xlabel="Lag time(s)", ylabel="Time(s)", ax=None):
     """Generates a lag plot.
 
     Arguments:
@@ -42,28 +120,24 @@ def lag_plot(data, lag=5, filename=None,
     title -- graph title (if None, then "Lag %d plot" % lag is used)
     xlabel -- label on x-axis
     ylabel -- label on y-axis
+    ax -- as for run_sequence_plot()
     """
 
     if title is None:
         title = "Lag %d plot" % lag
 
-    # Python's index operator allows correct wrapping if lag index
-    # is less than zero.
-    xs = [ data[x-lag] for x in range(len(data)) ]
+    # Wraps around like data[x - lag] would.
+    xs = numpy.roll(numpy.asarray(data), lag)
 
-    plt.cla()
-    p = plt.plot(xs, data, 'rx')
-    plt.title(title)
-    plt.ylabel(ylabel)
-    plt.xlabel(xlabel)
-
-    if filename is not None:
-        plt.savefig(filename)
-    else:
-        plt.show()
+    axes = _axes(ax)
+    axes.plot(xs, data, 'rx')
+    axes.set_title(title)
+    axes.set_ylabel(ylabel)
+    axes.set_xlabel(xlabel)
+    _finish(axes, filename, ax is None)
 
 def acr_plot(data, filename=None, title="ACR Plot",
-        xlabel="Lag #", ylabel="Correlation"):
+        xlabel="Lag #", ylabel="Correlation", maxlag=None, ax=None):
     """Generates an ACF plot, demeaned and normalised.
 
     Arguments:
@@ -74,17 +148,82 @@ def acr_plot(data, filename=None, title="ACR Plot",
     title -- graph title
     xlabel -- label on x-axis
     ylabel -- label on y-axis
+    maxlag -- largest lag to plot (None plots all lags)
+    ax -- as for run_sequence_plot()
     """
 
-    plt.cla()
-    plt.acorr(data, detrend=mlab.detrend_mean, usevlines=True,
-            maxlags=None, normed=True, lw=2)
+    lags, acf = autocorrelation(data, maxlag)
+    # Symmetric around lag 0, as plt.acorr() draws it.
+    lags = numpy.concatenate((-lags[:0:-1], lags))
+    acf = numpy.concatenate((acf[:0:-1], acf))
+
+    axes = _axes(ax)
+    axes.vlines(lags, 0, acf, lw=2)
+    axes.axhline(color="k")
+
+    axes.set_title(title)
+    axes.set_xlabel(xlabel)
+    axes.set_ylabel(ylabel)
+    _finish(axes, filename, ax is None)
+
+# ---
+
+PlotJob = collections.namedtuple("PlotJob", "kind data filename options")
+PlotJob.__new__.__defaults__ = (None, )
+
+_PLOTS = {
+    "run_sequence": run_sequence_plot,
+    "lag": lag_plot,
+    "acr": acr_plot,
+}
+
+# The figure of a rendering process, reused for all its jobs.
+_render_figure = None
+
+def _init_render_worker(figsize, dpi):
+    global _render_figure
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    _render_figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(_render_figure)
+
+def _render_job(job):
+    job = PlotJob(*job)
+    if job.kind not in _PLOTS:
+        raise GraphError("unknown kind of plot: %r" % (job.kind, ))
+    _render_figure.clf()
+    ax = _render_figure.add_subplot(111)
+    _PLOTS[job.kind](job.data, filename=job.filename, ax=ax,
+            **(job.options or {}))
+    return job.filename
+
+def render_plots(jobs, workers=None, figsize=None, dpi=None):
+    """Renders many plots to files without pyplot, on matplotlib's Agg
+    backend, optionally in parallel. Each process draws all its plots into
+    a single Figure, which it clears between plots.
+
+    Arguments:
+    jobs -- list of PlotJob(kind, data, filename, options) (or equivalent
+            tuples), kind being one of "run_sequence", "lag" or "acr", and
+            options an optional dict of keyword arguments for the
+            corresponding *_plot() function
 
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
+    Keyword arguments:
+    workers -- number of processes to render in (None renders in this
+               process)
+    figsize -- figure size in inches (None uses matplotlib's default)
+    dpi -- figure resolution (None uses matplotlib's default)
 
-    if filename is not None:
-        plt.savefig(filename)
-    else:
-        plt.show()
+    Returns the list of written filenames, in the order of jobs.
+    """
+
+    jobs = [tuple(job) for job in jobs]
+    if workers is None:
+        _init_render_worker(figsize, dpi)
+        return [_render_job(job) for job in jobs]
+    import multiprocessing
+    pool = multiprocessing.Pool(workers, _init_render_worker, (figsize, dpi))
+    try:
+        return pool.map(_render_job, jobs)
+    finally:
+        pool.terminate()
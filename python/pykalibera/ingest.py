@@ -0,0 +1,181 @@
+import bz2, codecs, io, json, re
+
+from pykalibera.data import Data
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r"\s*")
+# Characters that can continue a number, or the literals true, false and
+# null, after a prefix of them that is already valid JSON (e.g. "0." of
+# "0.5" decodes as 0).
+_CONTINUATION = re.compile(r"[-+.0-9a-zA-Z]*")
+_decoder = json.JSONDecoder()
+
+class _Reader(object):
+    """An incremental JSON reader: objects and arrays can be walked one
+    entry at a time, and only the value being decoded is held in memory."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = u""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        # Drop what was consumed and read more, at least doubling the
+        # buffer so that retrying a long value costs linear time overall.
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        chunk = self.f.read(max(self.chunk_size, len(self.buf)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """The next non-whitespace character, or None at the end."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, chars):
+        c = self.peek()
+        if c is None or c not in chars:
+            raise ValueError("malformed JSON: expected one of %r, got %r" %
+                    (chars, c))
+        self.pos += 1
+        return c
+
+    def decode(self):
+        """Decode the next value as a whole."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self._fill():
+                    continue
+                raise
+            # A value that runs to the end of the buffer may continue in the
+            # file. Only accept it once a delimiter follows it.
+            if not self.eof and \
+                    _CONTINUATION.match(self.buf, end).end() == len(self.buf) \
+                    and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Walk the next object, yielding its keys. The caller consumes
+        each value before asking for the next key."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def elements(self):
+        """Walk the next array. The caller consumes each element."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.expect(",]") == "]":
+                return
+
+    def skip(self):
+        """Consume the next value without holding all of it in memory."""
+        c = self.peek()
+        if c == "{":
+            for _ in self.items():
+                self.skip()
+        elif c == "[":
+            for _ in self.elements():
+                self.skip()
+        else:
+            self.decode()
+
+def _open(source):
+    if not isinstance(source, basestring):
+        return source, False
+    if source.endswith(".bz2"):
+        return codecs.getreader("utf-8")(bz2.BZ2File(source)), True
+    return io.open(source, encoding="utf-8"), True
+
+def iter_krun_results(source, warmup=0, field="wallclock_times",
+        chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+    """Stream-parse a Krun results file, yielding (key, data) for each
+    benchmark as it is read, where key is a (benchmark, vm, variant) tuple
+    split from the "bench:vm:variant" keys Krun uses, and data a two level
+    Data of executions and in-process iterations. Only one benchmark is
+    held in memory at a time.
+
+    Executions without measurements (e.g. those that crashed) are left
+    out, and so are benchmarks with no execution left. The remaining
+    executions must have the same number of iterations.
+
+    Arguments:
+    source -- Path of the results file, which is decompressed if its name
+              ends in ".bz2", or a file object open on the JSON text.
+
+    Keyword arguments:
+    warmup -- Number of in-process iterations to drop from the start of
+              each execution. Either an int, or a dict mapping keys to an
+              int (missing keys drop none).
+    field -- Top level key of the results to read, mapping "bench:vm:variant"
+             to lists of per-execution lists of measurements.
+    chunk_size -- Number of characters to read from the file at a time.
+
+    Other keyword arguments are passed on to Data.
+    """
+
+    kwargs.setdefault("validate", "shape")
+    f, close = _open(source)
+    try:
+        reader = _Reader(f, chunk_size)
+        for name in reader.items():
+            if name != field:
+                reader.skip()
+                continue
+            for raw_key in reader.items():
+                key = tuple(raw_key.split(":"))
+                if len(key) != 3:
+                    raise ValueError("expected a bench:vm:variant key, got %r"
+                            % raw_key)
+                drop = warmup.get(key, 0) if isinstance(warmup, dict) \
+                    else warmup
+                executions = []
+                for _ in reader.elements():
+                    execution = reader.decode()
+                    if not execution:
+                        continue
+                    if drop >= len(execution):
+                        raise ValueError("%s: cannot drop %d warm-up "
+                                "iterations out of %d" %
+                                (raw_key, drop, len(execution)))
+                    executions.append(execution[drop:])
+                if not executions:
+                    continue
+                iterations = len(executions[0])
+                if any(len(e) != iterations for e in executions):
+                    raise ValueError("%s: executions have different numbers "
+                            "of iterations" % raw_key)
+                yield key, Data(dict(((i, ), e) for i, e in
+                        enumerate(executions)), [len(executions), iterations],
+                        **kwargs)
+            return
+    finally:
+        if close:
+            f.close()
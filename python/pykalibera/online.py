@@ -0,0 +1,247 @@
+import collections
+
+from pykalibera.data import Data, _Estimators, _variance_components
+
+class RunningStats(object):
+    """Welford's running mean and sum of squared deviations from the mean."""
+
+    __slots__ = ("count", "mean", "m2")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+class _Node(RunningStats):
+    """Running statistics over the children of one index prefix. The nodes
+    of top level repetitions also collect the sums of squared deviations of
+    their subtree, and the prefixes in it that are already complete, until
+    the whole subtree is complete."""
+
+    __slots__ = ("sums", "done")
+
+    def __init__(self, levels=None):
+        RunningStats.__init__(self)
+        if levels is not None:
+            self.sums = [0.0] * levels
+            self.done = set()
+
+class DataBuilder(_Estimators):
+    def __init__(self, reps, keep_values=True):
+        """Collects measurements one at a time, as a harness produces them,
+        keeping running statistics for each level so that the estimators of
+        Data can be read at any point without rescanning the measurements.
+
+        The number of top level repetitions is not fixed: it grows as top
+        level repetitions (e.g. executions) complete. Statistics only take
+        complete top level repetitions into account.
+
+        Arguments:
+        reps -- List of reps for each level *below* the top level, high to
+                low.
+
+        Keyword arguments:
+        keep_values -- Keep the measurements themselves, as needed by
+                       freeze(). Without them, memory use only depends on
+                       the number of incomplete index prefixes.
+        """
+
+        if not reps:
+            raise ValueError("need at least one level below the top level")
+        self.reps = list(reps)
+        self.n = len(self.reps) + 1
+        self.keep_values = keep_values
+
+        self._open = {} # index prefix -> _Node
+        self._sums = [0.0] * (self.n - 1)
+        self._top = RunningStats()
+        self._values = {}
+        self._completed = [] # top level indicies, in order of completion
+
+    def add(self, index, value):
+        """Add one measurement.
+
+        Arguments:
+        index -- Tuple of all but the last index, as the keys of the dict
+                 given to Data. The top level index may be any hashable
+                 value; the others must be in range.
+        value -- The measurement, appended to those already at index.
+        """
+
+        index = tuple(index)
+        if len(index) != self.n - 1:
+            raise ValueError("expected an index of length %d" % (self.n - 1))
+        for i, rep in zip(index[1:], self.reps):
+            if not 0 <= i < rep:
+                raise ValueError("index out of range: %r" % (index, ))
+        top = self._open.get(index[:1], False)
+        if top is None:
+            raise ValueError("top level repetition %r is already complete" %
+                    (index[0], ))
+        if top is False:
+            top = self._open[index[:1]] = _Node(self.n - 1)
+        if index in top.done:
+            raise ValueError("too many values at %r" % (index, ))
+
+        if self.keep_values:
+            self._values.setdefault(index, []).append(value)
+        self._add(index, value)
+
+    def _add(self, prefix, value):
+        # Feed value, either a measurement or the mean of a completed child,
+        # to the node at prefix, completing that node (and maybe its
+        # ancestors) if it now has all its children.
+        while True:
+            depth = len(prefix)
+            node = self._open.get(prefix)
+            if node is None:
+                node = self._open[prefix] = _Node()
+            node.add(value)
+            if node.count < self.reps[depth - 1]:
+                return
+
+            # The node is complete: its deviations belong to level n - depth.
+            top = self._open[prefix[:1]]
+            top.sums[self.n - depth - 1] += node.m2
+            if depth == 1:
+                for i, sum in enumerate(top.sums):
+                    self._sums[i] += sum
+                self._top.add(top.mean)
+                self._completed.append(prefix[0])
+                # Remember that this top level repetition is done.
+                self._open[prefix] = None
+                return
+            del self._open[prefix]
+            top.done.add(prefix)
+            prefix, value = prefix[:-1], node.mean
+
+    @property
+    def complete(self):
+        """The number of complete top level repetitions."""
+        return self._top.count
+
+    def full_reps(self):
+        """The reps of the complete top level repetitions, as for Data."""
+        return [self.complete] + self.reps
+
+    def r(self, i):
+        """The number of repetitions for level i, as Data.r(), the top level
+        counting the complete repetitions."""
+        assert 1 <= i <= self.n
+        return self.full_reps()[self.n - i]
+
+    def mean(self):
+        """The mean over all complete top level repetitions."""
+        if not self.complete:
+            raise ValueError("no complete top level repetition yet")
+        return self._top.mean
+
+    def variance_components(self):
+        """As Data.variance_components(), over the complete top level
+        repetitions."""
+        if not self.complete:
+            raise ValueError("no complete top level repetition yet")
+        return _variance_components(self.full_reps(),
+                self._sums + [self._top.m2])
+
+    def freeze(self, **kwargs):
+        """Return a Data holding the complete top level repetitions, which
+        are numbered from 0 in the order they completed. Keyword arguments
+        are passed on to Data."""
+
+        if not self.keep_values:
+            raise ValueError("the measurements were not kept")
+        renumber = dict((top, i) for i, top in enumerate(self._completed))
+        data = dict(((renumber[index[0]], ) + index[1:], values)
+                for index, values in self._values.iteritems()
+                if index[0] in renumber)
+        kwargs.setdefault("validate", "shape")
+        return Data(data, self.full_reps(), **kwargs)
+
+Decision = collections.namedtuple("Decision",
+        "stop complete mean half_width recommended_reps")
+
+class SequentialSampler(object):
+    def __init__(self, reps, costs, target, min_complete=3, max_complete=None,
+            keep_values=True):
+        """A sequential stopping rule: consumes measurements as they arrive
+        and, whenever a top level repetition (e.g. an execution) completes,
+        decides whether the 95% confidence interval of the mean is precise
+        enough to stop.
+
+        Arguments:
+        reps -- List of reps for each level below the top level, high to
+                low, as for DataBuilder.
+        costs -- A list of costs for each level, *high* to *low*, as for
+                 Data.optimalreps().
+        target -- Target half-width of the 95% confidence interval relative
+                  to the mean, e.g. 0.01 for +/- 1%.
+
+        Keyword arguments:
+        min_complete -- Never stop before this many top level repetitions
+                        are complete. At least 2.
+        max_complete -- If not None, stop once this many top level
+                        repetitions are complete, precise or not.
+        keep_values -- As for DataBuilder.
+        """
+
+        if len(costs) != len(reps) + 1:
+            raise ValueError("expected a cost for each of the %d levels" %
+                    (len(reps) + 1))
+        self.builder = DataBuilder(reps, keep_values)
+        self.costs = list(costs)
+        self.target = target
+        self.min_complete = max(2, min_complete)
+        self.max_complete = max_complete
+
+    def add(self, index, value):
+        """Add one measurement, as DataBuilder.add(). Returns a Decision if
+        the measurement completed a top level repetition, None otherwise."""
+
+        complete = self.builder.complete
+        self.builder.add(index, value)
+        if self.builder.complete != complete:
+            return self.decision()
+        return None
+
+    def decision(self):
+        """Returns a Decision with:
+        stop -- Whether enough top level repetitions have been collected.
+        complete -- The number of complete top level repetitions.
+        mean -- The mean so far (None if nothing is complete).
+        half_width -- The 95% confidence interval so far (None if there are
+                      fewer than 2 complete top level repetitions).
+        recommended_reps -- The optimal reps for each level below the top
+                            level, high to low, according to the data so
+                            far. An entry is None while the T_i^2 estimates
+                            do not allow a recommendation.
+        """
+
+        builder = self.builder
+        complete = builder.complete
+        if complete < 2:
+            mean = builder.mean() if complete else None
+            return Decision(False, complete, mean, None,
+                    [None] * (builder.n - 1))
+
+        mean = builder.mean()
+        half_width = builder.confidence95()
+        recommended = []
+        for i in range(builder.n - 1, 0, -1):
+            try:
+                recommended.append(builder.optimalreps(i, self.costs))
+            except (ValueError, ZeroDivisionError):
+                # Negative or zero variance estimates.
+                recommended.append(None)
+
+        stop = complete >= self.min_complete and \
+                half_width <= self.target * abs(mean)
+        if self.max_complete is not None and complete >= self.max_complete:
+            stop = True
+        return Decision(stop, complete, mean, half_width, recommended)
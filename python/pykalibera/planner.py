@@ -0,0 +1,157 @@
+import collections, math
+
+from pykalibera.data import student_t_quantile95
+
+PlanEntry = collections.namedtuple("PlanEntry",
+        "reps cost expected_half_width")
+
+class _Benchmark(object):
+    """What the planner needs to know about one pilot Data."""
+
+    def __init__(self, data, costs):
+        if len(costs) != data.n:
+            raise ValueError("expected a cost for each of the %d levels" %
+                    data.n)
+        self.mean = abs(data.mean())
+        if self.mean == 0:
+            raise ValueError("cannot plan for a relative precision when the "
+                    "mean is zero")
+        costs = [float(x) for x in costs]
+        if min(costs) <= 0:
+            raise ValueError("costs must be positive")
+        n = data.n
+
+        # The reps of the levels below the top level, high to low, are the
+        # cost-optimal ones. When a variance estimate is not positive, there
+        # is nothing to gain from repeating that level (T_i^2 <= 0), or no
+        # guidance (T_{i+1}^2 <= 0) and the pilot's reps are kept.
+        self.lower_reps = []
+        for i in range(n - 1, 0, -1):
+            if not data.Ti2(i) > 0:
+                rep = 1
+            elif not data.Ti2(i + 1) > 0:
+                rep = data.r(i)
+            else:
+                rep = data.optimalreps(i, costs)
+            self.lower_reps.append(max(1, rep))
+
+        # The cost of one top level repetition. A repetition of level i
+        # costs c_i plus r_{i-1} repetitions of level i - 1.
+        unit_cost = costs[-1]
+        for index in range(n - 2, -1, -1):
+            unit_cost = costs[index] + self.lower_reps[index] * unit_cost
+        self.unit_cost = unit_cost
+
+        # The variance of the mean is the sum of T_i^2 / (r_n ... r_i), so
+        # it is spread / r_n where:
+        spread = 0.0
+        for i in range(1, n + 1):
+            ti2 = max(0.0, data.Ti2(i))
+            for rep in self.lower_reps[:n - i]:
+                ti2 /= rep
+            spread += ti2
+        self.spread = spread
+
+    def half_width(self, top_reps):
+        """The expected 95% confidence interval for top_reps top level
+        repetitions."""
+        return student_t_quantile95(top_reps - 1) * \
+            (self.spread / top_reps) ** 0.5
+
+    def relative_half_width(self, top_reps):
+        return self.half_width(top_reps) / self.mean
+
+def plan_experiment(pilots, costs, budget, min_top_reps=2):
+    """Plans how many repetitions of each level to run for each benchmark
+    of a suite, so that the whole suite fits in a budget and the sum of
+    the expected relative 95% confidence intervals is as small as possible.
+
+    The reps of the levels below the top level are chosen per benchmark
+    with Data.optimalreps(). The budget is then shared out as top level
+    repetitions (e.g. executions): first by the continuous optimum, where
+    the number of top level repetitions r_n of a benchmark is proportional
+    to (sqrt(V) / (mean * cost of a top level repetition)) ** (2 / 3),
+    V / r_n being the expected variance of its mean, then by adding or
+    removing single repetitions where they change the expected intervals
+    the most per unit of cost.
+
+    Arguments:
+    pilots -- Dict mapping keys (e.g. (benchmark, vm) pairs) to a pilot
+              Data for each.
+    costs -- Either a dict mapping the same keys to a list of costs for each
+             level, high to low, as for Data.optimalreps(), or a single such
+             list for all keys. E.g. the cost of starting a VM and of one
+             in-process iteration, in seconds.
+    budget -- The total cost allowed for the suite, in the unit of costs.
+
+    Keyword arguments:
+    min_top_reps -- Minimum number of top level repetitions per benchmark.
+                    At least 2.
+
+    Returns a dict mapping each key to a PlanEntry of the reps of each
+    level (high to low, as for Data), the cost of running them and the 95%
+    confidence interval they are expected to give.
+    """
+
+    min_top_reps = max(2, min_top_reps)
+    benchmarks = {}
+    for key, data in pilots.items():
+        key_costs = costs[key] if isinstance(costs, dict) else costs
+        benchmarks[key] = _Benchmark(data, key_costs)
+
+    minimum = sum(b.unit_cost * min_top_reps for b in benchmarks.values())
+    if minimum > budget:
+        raise ValueError("budget too small: %d top level repetitions of "
+                "each benchmark cost %g" % (min_top_reps, minimum))
+
+    # Continuous optimum, ignoring the change of the t quantile.
+    weights = dict(
+            (key, (b.spread ** 0.5 / (b.mean * b.unit_cost)) ** (2 / 3.))
+            for key, b in benchmarks.items())
+    total = sum(weights[key] * b.unit_cost for key, b in benchmarks.items())
+    top_reps = {}
+    for key, b in benchmarks.items():
+        if total > 0:
+            top_reps[key] = max(min_top_reps,
+                    int(math.floor(budget * weights[key] / total)))
+        else:
+            top_reps[key] = min_top_reps
+
+    def spent():
+        return sum(top_reps[key] * b.unit_cost
+                for key, b in benchmarks.items())
+
+    # Rounding up to min_top_reps may have overspent: take back the
+    # repetitions that are worth the least per unit of cost.
+    while spent() > budget:
+        def loss(key):
+            b = benchmarks[key]
+            r = top_reps[key]
+            return (b.relative_half_width(r - 1) - b.relative_half_width(r)) \
+                / b.unit_cost
+        key = min((key for key in top_reps if top_reps[key] > min_top_reps),
+                key=loss)
+        top_reps[key] -= 1
+
+    # Spend what is left where it helps the most per unit of cost.
+    left = budget - spent()
+    while True:
+        candidates = [key for key, b in benchmarks.items()
+                if b.unit_cost <= left]
+        if not candidates:
+            break
+        def gain(key):
+            b = benchmarks[key]
+            r = top_reps[key]
+            return (b.relative_half_width(r) - b.relative_half_width(r + 1)) \
+                / b.unit_cost
+        key = max(candidates, key=gain)
+        top_reps[key] += 1
+        left -= benchmarks[key].unit_cost
+
+    plan = {}
+    for key, b in benchmarks.items():
+        r = top_reps[key]
+        plan[key] = PlanEntry([r] + b.lower_reps, r * b.unit_cost,
+                b.half_width(r))
+    return plan
@@ -0,0 +1,140 @@
+import math
+
+from pykalibera.data import _Estimators, _squared_deviations
+from pykalibera.data import _variance_components
+
+def _add_exact(partials, x):
+    """Add x to the exact sum represented by the list of non-overlapping
+    floats partials (Shewchuk's algorithm, as used by math.fsum())."""
+
+    i = 0
+    for y in partials:
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            partials[i] = lo
+            i += 1
+        x = hi
+    partials[i:] = [x]
+
+def _exact_sum(values):
+    partials = []
+    for x in values:
+        _add_exact(partials, x)
+    return partials
+
+class DataSummary(_Estimators):
+    def __init__(self, reps, top_means, sums, total):
+        """Sufficient statistics of a Data, or of a shard of one along the
+        top level (e.g. the executions run on one machine). Summaries of
+        shards with the same reps below the top level can be serialised,
+        shipped and merged in any order, and give exactly the same mean(),
+        Si2(), Ti2() and confidence95() as a Data of all the measurements.
+
+        This is exact because the sums of squared deviations of the levels
+        below the top level, and the sum of all measurements, are kept as
+        exact sums of floats, which merge without rounding, and the means of
+        the top level repetitions are kept as they are.
+
+        Use from_data() or from_dict() rather than the constructor.
+
+        Arguments:
+        reps -- List of reps for each level *below* the top level, high to
+                low.
+        top_means -- List of the means of the top level repetitions.
+        sums -- For each level below the top level, low to high, the exact
+                sum of the squared deviations, as a list of partials.
+        total -- The exact sum of all measurements, as a list of partials.
+        """
+
+        self.lower_reps = list(reps)
+        self.top_means = list(top_means)
+        self.sums = [list(partials) for partials in sums]
+        self.total = list(total)
+
+    @classmethod
+    def from_data(cls, data):
+        """Summarise a Data (using its dict of lists of measurements)."""
+
+        sums = []
+        if data.n == 1:
+            means = list(data.data[()])
+        else:
+            means = []
+            lists = (data.data[index]
+                    for index in data.index_iterator(stop=data.n - 1))
+            sums.append(_exact_sum(_squared_deviations(lists, means)))
+            # Levels 2 to n - 1, leaving the means of the top level.
+            for rep in reversed(data.reps[1:-1]):
+                parents = []
+                blocks = (means[start:start + rep]
+                        for start in range(0, len(means), rep))
+                sums.append(_exact_sum(_squared_deviations(blocks, parents)))
+                means = parents
+        total = _exact_sum(float(value)
+                for index in data.index_iterator(stop=data.n - 1)
+                for value in data.data[index])
+        return cls(data.reps[1:], means, sums, total)
+
+    def merge(self, other):
+        """Return the summary of the measurements of self and other, the top
+        level repetitions of other coming after those of self."""
+
+        if self.lower_reps != other.lower_reps:
+            raise ValueError("cannot merge summaries with reps %r and %r "
+                    "below the top level" % (self.lower_reps,
+                                             other.lower_reps))
+        sums = [_exact_sum(mine + theirs)
+                for mine, theirs in zip(self.sums, other.sums)]
+        total = _exact_sum(self.total + other.total)
+        return DataSummary(self.lower_reps, self.top_means + other.top_means,
+                sums, total)
+
+    @classmethod
+    def merge_all(cls, summaries):
+        """Merge a non-empty sequence of summaries."""
+        summaries = iter(summaries)
+        merged = next(summaries)
+        for summary in summaries:
+            merged = merged.merge(summary)
+        return merged
+
+    def to_dict(self):
+        """A JSON-serialisable dict. Floats are only exactly preserved by
+        serialisers that round-trip them, as the json module does."""
+        return {"reps": self.lower_reps, "top_means": self.top_means,
+                "sums": self.sums, "total": self.total}
+
+    @classmethod
+    def from_dict(cls, d):
+        """Inverse of to_dict()."""
+        return cls(d["reps"], d["top_means"], d["sums"], d["total"])
+
+    @property
+    def reps(self):
+        """The reps of the summarised measurements, as for Data."""
+        return [len(self.top_means)] + self.lower_reps
+
+    @property
+    def n(self):
+        return len(self.lower_reps) + 1
+
+    def r(self, i):
+        """The number of repetitions for level i, as Data.r()."""
+        assert 1 <= i <= self.n
+        return self.reps[self.n - i]
+
+    def mean(self):
+        """The mean of all measurements, as Data.mean()."""
+        count = len(self.top_means)
+        for rep in self.lower_reps:
+            count *= rep
+        return math.fsum(self.total) / float(count)
+
+    def variance_components(self):
+        """As Data.variance_components()."""
+        top = math.fsum(_squared_deviations([self.top_means], []))
+        return _variance_components(self.reps,
+                [math.fsum(partials) for partials in self.sums] + [top])
@@ -0,0 +1,167 @@
+import math
+
+from pykalibera.data import Data, numpy, _mean
+
+# Default minimum number of values in a steady state.
+DEFAULT_MIN_STEADY = 20
+
+def _noise_variance(sequence):
+    """A robust estimate of the variance of the noise around the mean of a
+    sequence with a few shifts in mean, from the median absolute difference
+    of consecutive values.
+
+    With coarse timers, or repeated identical timings, most consecutive
+    values are equal and that median is 0, although there is noise. Half
+    the mean squared difference of consecutive values (von Neumann's
+    estimator) is used instead, which each shift in mean only raises by
+    its square over 2 * (n - 1)."""
+
+    diffs = sorted(abs(b - a) for a, b in zip(sequence, sequence[1:]))
+    if not diffs:
+        return 0.0
+    median = diffs[len(diffs) // 2]
+    if median == 0:
+        return math.fsum(d * d for d in diffs) / (2 * len(diffs))
+    # For normal noise, |x - y| has median 0.6745 * sqrt(2) * sigma.
+    return (median / (0.6745 * 2 ** 0.5)) ** 2
+
+def _split(sums, s, t, min_size):
+    """The best split k of sequence[s:t] into two segments, from the prefix
+    sums of the centred sequence, and the reduction of the sum of squared
+    deviations from the segment means that it gives. Returns (gain, k)."""
+
+    # Splitting at k removes total^2 / (t - s) from the cost and adds back
+    # left^2 / (k - s) + right^2 / (t - k), the squares cancelling out.
+    total = sums[t] - sums[s]
+    best, best_k = None, None
+    for k in range(s + min_size, t - min_size + 1):
+        left = sums[k] - sums[s]
+        right = total - left
+        score = left * left / (k - s) + right * right / (t - k)
+        if best is None or score > best:
+            best, best_k = score, k
+    return best - total * total / (t - s), best_k
+
+def _split_numpy(sums, s, t, min_size):
+    """As _split(), scoring all the splits at once."""
+
+    total = sums[t] - sums[s]
+    ks = numpy.arange(s + min_size, t - min_size + 1)
+    left = sums[ks] - sums[s]
+    right = total - left
+    scores = left * left / (ks - s) + right * right / (t - ks)
+    i = scores.argmax()
+    return float(scores[i] - total * total / (t - s)), int(ks[i])
+
+def changepoints(sequence, penalty=None, min_size=2):
+    """Find the changes in mean of a sequence by binary segmentation: the
+    segment whose best split most reduces the sum of squared deviations
+    from the segment means is split, as long as the reduction exceeds
+    penalty. With prefix sums, finding the best split of a segment takes
+    time linear in its length, so the whole search takes O(n log n) time
+    when the splits are balanced and never more than O(n) per changepoint,
+    even across a long steady state.
+
+    Arguments:
+    sequence -- List of values, e.g. the in-process iterations of one
+                execution.
+
+    Keyword arguments:
+    penalty -- Cost of a changepoint. Defaults to 2 * sigma^2 * log(n),
+               sigma^2 being a robust estimate of the noise variance.
+    min_size -- Minimum length of a segment.
+
+    Returns the sorted list of the indicies at which a new segment starts.
+    """
+
+    n = len(sequence)
+    if n < 2 * min_size:
+        return []
+    if penalty is None:
+        penalty = 2 * _noise_variance(sequence) * math.log(n)
+    # Centring the values keeps the prefix sums small.
+    centre = _mean(sequence)
+    if numpy:
+        values = numpy.asarray(sequence, dtype="d") - centre
+        sums = numpy.concatenate(([0.0], numpy.cumsum(values)))
+        split = _split_numpy
+    else:
+        sums = [0.0]
+        for value in sequence:
+            sums.append(sums[-1] + (value - centre))
+        split = _split
+
+    points = []
+    segments = [(0, n)]
+    while segments:
+        s, t = segments.pop()
+        if t - s < 2 * min_size:
+            continue
+        gain, k = split(sums, s, t, min_size)
+        if gain > penalty:
+            points.append(k)
+            segments.extend([(s, k), (k, t)])
+    return sorted(points)
+
+def steady_state(sequence, penalty=None, min_size=2,
+        min_steady=DEFAULT_MIN_STEADY, tolerance=0.01):
+    """Detect where a sequence reaches a steady state, e.g. where an
+    execution has warmed up.
+
+    The sequence is split into segments with changepoints(). The steady
+    state is the last segment, extended backwards over the segments whose
+    means are within tolerance of its own (relative to its mean).
+
+    Arguments:
+    sequence -- List of values, e.g. the in-process iterations of one
+                execution.
+
+    Keyword arguments:
+    penalty, min_size -- As for changepoints().
+    min_steady -- Minimum length of the steady state.
+    tolerance -- Relative difference of means below which segments are
+                 considered equivalent.
+
+    Returns the number of leading values to drop as warm-up, or None if
+    there is no steady state of at least min_steady values.
+    """
+
+    bounds = [0] + changepoints(sequence, penalty, min_size) + \
+        [len(sequence)]
+    means = [_mean(sequence[s:t]) for s, t in zip(bounds, bounds[1:])]
+    steady = means[-1]
+    first = len(means) - 1
+    while first > 0 and \
+            abs(means[first - 1] - steady) <= tolerance * abs(steady):
+        first -= 1
+    cutoff = bounds[first]
+    if len(sequence) - cutoff < min_steady:
+        return None
+    return cutoff
+
+def trim_warmup(data, **kwargs):
+    """Drop the warm-up of every list of values of a Data (e.g. of each
+    execution of a two level Data of executions and in-process
+    iterations). As Data needs the same number of values in each list, the
+    largest warm-up found is dropped from all lists.
+
+    Keyword arguments are passed to steady_state().
+
+    Returns (trimmed Data, number of values dropped from each list). Raises
+    ValueError if a list has no steady state, or if the steady states of
+    the lists leave too few values in some list.
+    """
+
+    prefixes = list(data.index_iterator(stop=data.n - 1))
+    cutoff = 0
+    for prefix in prefixes:
+        found = steady_state(list(data.data[prefix]), **kwargs)
+        if found is None:
+            raise ValueError("no steady state at %r" % (prefix, ))
+        cutoff = max(cutoff, found)
+    if data.reps[-1] - cutoff < kwargs.get("min_steady", DEFAULT_MIN_STEADY):
+        raise ValueError("dropping %d warm-up values leaves too few" % cutoff)
+    trimmed = dict((prefix, list(data.data[prefix][cutoff:]))
+            for prefix in prefixes)
+    return Data(trimmed, data.reps[:-1] + [data.reps[-1] - cutoff],
+            validate="none"), cutoff
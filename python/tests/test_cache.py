@@ -0,0 +1,108 @@
+import os, time
+import pytest
+
+import support
+
+support.setup_paths()
+
+numpy = pytest.importorskip("numpy")
+
+from pykalibera.data import Data, DEFAULT_MAX_BATCH_BYTES
+from pykalibera.cache import BootstrapCache
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+@pytest.fixture
+def data():
+    return Data({
+        (0, ): [1.0, 2.0, 3.0],
+        (1, ): [3.0, 4.0, 6.0],
+        (2, ): [2.0, 2.5, 5.0],
+    }, [3, 3])
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+def test_bootstrap_means_cached(data, tmpdir):
+    cache = BootstrapCache(str(tmpdir))
+    expect = data.bootstrap_means(500, engine="weights", seed=3)
+    assert data.bootstrap_means(500, engine="weights", seed=3,
+            cache=cache) == expect
+    assert len(cache.entries()) == 1
+
+    # A second identical request is served from the cache, memory-mapped.
+    key = cache.key("means", [data], 500, "weights", 3,
+            DEFAULT_MAX_BATCH_BYTES)
+    assert isinstance(cache.get(key), numpy.memmap)
+    ci = data.bootstrap_confidence_interval(500, engine="weights", seed=3,
+            cache=cache)
+    assert len(cache.entries()) == 1
+    assert ci == data.bootstrap_confidence_interval(500, engine="weights",
+            seed=3)
+
+def test_key_covers_arguments_and_values(data, tmpdir):
+    cache = BootstrapCache(str(tmpdir))
+    base = cache.key("means", [data], 500, "weights", 3, 100)
+    assert base == cache.key("means", [data], 500, "weights", 3, 100)
+    assert base != cache.key("means", [data], 501, "weights", 3, 100)
+    assert base != cache.key("means", [data], 500, "batched", 3, 100)
+    assert base != cache.key("means", [data], 500, "weights", 4, 100)
+    assert base != cache.key("quotient", [data], 500, "weights", 3, 100)
+    other = Data({
+        (0, ): [1.0, 2.0, 3.0],
+        (1, ): [3.0, 4.0, 6.0],
+        (2, ): [2.0, 2.5, 5.5],
+    }, [3, 3])
+    assert base != cache.key("means", [other], 500, "weights", 3, 100)
+
+def test_bootstrap_quotient_cached(data, tmpdir):
+    cache = BootstrapCache(str(tmpdir))
+    other = Data({(0, ): [2.0, 4.0], (1, ): [3.0, 5.0]}, [2, 2])
+    expect = data.bootstrap_quotient(other, 500, engine="batched", seed=1)
+    for i in range(2):
+        assert data.bootstrap_quotient(other, 500, engine="batched", seed=1,
+                cache=cache) == expect
+    assert len(cache.entries()) == 1
+
+def test_cache_needs_numpy_engine(data, tmpdir):
+    cache = BootstrapCache(str(tmpdir))
+    with pytest.raises(ValueError):
+        data.bootstrap_means(10, cache=cache)
+    with pytest.raises(ValueError):
+        data.bootstrap_confidence_interval(10, engine="weights", cache=cache,
+                tolerance=0.01)
+
+def test_cache_needs_seed(data, tmpdir):
+    cache = BootstrapCache(str(tmpdir))
+    other = Data({(0, ): [2.0, 4.0], (1, ): [3.0, 5.0]}, [2, 2])
+    with pytest.raises(ValueError):
+        data.bootstrap_means(10, engine="weights", cache=cache)
+    with pytest.raises(ValueError):
+        data.bootstrap_confidence_interval(10, engine="weights", cache=cache)
+    with pytest.raises(ValueError):
+        data.bootstrap_quotient(other, 10, engine="weights", cache=cache)
+    assert cache.entries() == []
+
+def test_evict_by_size_and_age(tmpdir):
+    cache = BootstrapCache(str(tmpdir))
+    for i in range(3):
+        cache.put("k%d" % i, numpy.arange(100.0))
+        path = os.path.join(str(tmpdir), "k%d.npy" % i)
+        os.utime(path, (1000 + i, 1000 + i))
+    size = cache.entries()[0][1]
+
+    cache.get("k0") # Touching an entry makes it the most recently used.
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert sorted(os.path.basename(p) for p, _, _ in cache.entries()) == \
+        ["k0.npy", "k2.npy"]
+
+    cache.max_age = 60
+    cache.evict()
+    assert [os.path.basename(p) for p, _, _ in cache.entries()] == ["k0.npy"]
+
+    cache.clear()
+    assert cache.entries() == []
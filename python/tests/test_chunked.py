@@ -0,0 +1,137 @@
+import random
+import pytest
+
+import support
+
+support.setup_paths()
+
+numpy = pytest.importorskip("numpy")
+
+from pykalibera.data import Data, ArrayData, bootstrap_geomean
+from pykalibera.cache import BootstrapCache
+from pykalibera.chunked import ChunkedData
+from pykalibera.columnar import write_data
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+@pytest.fixture
+def data():
+    rng = random.Random(4)
+    return ArrayData([rng.gauss(10 + e % 3, 1) for e in range(7 * 3 * 4)],
+            [7, 3, 4])
+
+def chunked(data, chunk_size, reads=None):
+    flat = data.as_array().reshape(-1)
+    leaves = flat.size // data.reps[0]
+    def read(start, stop):
+        if reads is not None:
+            reads.append((start, stop))
+        return flat[start * leaves:stop * leaves]
+    return ChunkedData(read, data.reps, chunk_size=chunk_size)
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7])
+def test_statistics_match_in_memory(data, chunk_size):
+    ooc = chunked(data, chunk_size)
+    assert ooc.mean() == pytest.approx(data.mean())
+    assert ooc.mean((2, 1)) == pytest.approx(data.mean((2, 1)))
+    assert ooc[3, 2, 1] == data[3, 2, 1]
+    for i in range(1, 4):
+        assert ooc.Si2(i) == pytest.approx(data.Si2(i))
+        assert ooc.Ti2(i) == pytest.approx(data.Ti2(i))
+    assert ooc.confidence95() == pytest.approx(data.confidence95())
+
+def test_from_file(data, tmpdir):
+    path = str(tmpdir.join("run.kal"))
+    write_data(path, data)
+    ooc = ChunkedData.from_file(path, max_chunk_bytes=8 * 12 * 2)
+    assert ooc.chunk_size == 2
+    assert [start for start, _ in ooc.chunks()] == [0, 2, 4, 6]
+    assert ooc.as_array().tolist() == data.as_array().tolist()
+    assert ooc.Ti2(2) == pytest.approx(data.Ti2(2))
+
+def test_bootstrap_independent_of_chunk_size(data):
+    expect = chunked(data, 7).bootstrap_means(2000, engine="weights", seed=5)
+    for chunk_size in (1, 4):
+        assert chunked(data, chunk_size).bootstrap_means(2000,
+                engine="weights", seed=5) == pytest.approx(expect)
+    # Batching the iterations only changes the order of the draws.
+    assert chunked(data, 2).bootstrap_means(2000, engine="weights", seed=5,
+            max_batch_bytes=1) != pytest.approx(expect)
+
+def test_bootstrap_matches_in_memory_distribution(data):
+    ooc = chunked(data, 2).bootstrap_means(20000, engine="weights", seed=1)
+    mem = data.bootstrap_means(20000, engine="weights", seed=1)
+    assert numpy.mean(ooc) == pytest.approx(numpy.mean(mem), rel=1e-3)
+    assert numpy.std(ooc) == pytest.approx(numpy.std(mem), rel=0.05)
+
+    ci = chunked(data, 3).bootstrap_confidence_interval(20000,
+            engine="weights", seed=2)
+    expect = data.bootstrap_confidence_interval(20000, engine="weights",
+            seed=2)
+    assert ci.lower == pytest.approx(expect.lower, rel=0.01)
+    assert ci.upper == pytest.approx(expect.upper, rel=0.01)
+
+def test_bootstrap_quotient(data):
+    ooc = chunked(data, 3)
+    ci = ooc.bootstrap_quotient(data, 2000, engine="weights", seed=3)
+    assert ci.lower < 1 < ci.upper
+    ci = ooc.bootstrap_quotient(chunked(data, 5), 2000, engine="weights",
+            seed=3)
+    assert ci.lower < 1 < ci.upper
+    assert chunked(data, 2).bootstrap_quotient(chunked(data, 1), 2000,
+            engine="weights", seed=3) == ci
+
+def test_resampled_with_other_data_in_chunks(data, tmpdir):
+    reads = []
+    ooc = chunked(data, 3, reads)
+    ci = data.bootstrap_quotient(ooc, 2000, engine="weights", seed=3)
+    assert ci.lower < 1 < ci.upper
+    # The same streams are used whichever operand is out of core.
+    assert ci == data.bootstrap_quotient(chunked(data, 7), 2000,
+            engine="weights", seed=3)
+    ci = bootstrap_geomean([ooc, data], [data, ooc], 2000, engine="weights",
+            seed=3)
+    assert ci.lower < 1 < ci.upper
+
+    cache = BootstrapCache(str(tmpdir))
+    key = cache.key("means", [ooc], 2000, "weights", 3, 100)
+    assert key == cache.key("means", [chunked(data, 2)], 2000, "weights", 3,
+            100)
+    assert key != cache.key("means", [data], 2000, "weights", 3, 100)
+    ooc.bootstrap_means(2000, engine="weights", seed=3, cache=cache)
+
+    assert reads
+    assert all(stop - start <= 3 for start, stop in reads)
+
+def test_unsupported(data):
+    ooc = chunked(data, 3)
+    with pytest.raises(ValueError):
+        ooc.bootstrap_means(100)
+    with pytest.raises(ValueError):
+        data.bootstrap_quotient(ooc, 100)
+    with pytest.raises(ValueError):
+        data.bootstrap_quotient(ooc, 100, engine="batched", seed=1)
+    with pytest.raises(ValueError):
+        bootstrap_geomean([data], [ooc], 100)
+    with pytest.raises(ValueError):
+        ooc.bootstrap_means(100, engine="weights", workers=2)
+    bad = ChunkedData(lambda start, stop: [1.0], [2, 2], chunk_size=1)
+    with pytest.raises(ValueError):
+        bad.mean()
+
+def test_collapse(data):
+    ooc = chunked(data, 2)
+    for levels in (1, 2):
+        assert ooc.collapse(levels).as_array() == \
+                pytest.approx(data.collapse(levels).as_array())
+    assert ooc.collapse(3) is ooc
+    # Collapsed data is resampled in memory, as by the other classes.
+    assert ooc.bootstrap_means(1000, engine="batched", seed=1,
+            resample_levels=1) == pytest.approx(data.bootstrap_means(1000,
+            engine="batched", seed=1, resample_levels=1))
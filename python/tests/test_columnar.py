@@ -0,0 +1,87 @@
+import pytest
+
+import support
+
+support.setup_paths()
+
+numpy = pytest.importorskip("numpy")
+
+from pykalibera.data import Data
+from pykalibera.columnar import ColumnarWriter, write_data, read_header
+from pykalibera.columnar import load_data, ALIGNMENT
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+@pytest.fixture
+def data():
+    return Data({
+        (0, 0): [1.0, 2.0, 3.0],
+        (0, 1): [3.0, 4.0, 6.0],
+        (1, 0): [2.0, 2.5, 5.0],
+        (1, 1): [1.5, 4.5, 3.0],
+    }, [2, 2, 3])
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+def test_round_trip(data, tmpdir):
+    path = str(tmpdir.join("run.kal"))
+    write_data(path, data, {"benchmark": "fib", "vm": "pypy"})
+
+    reps, metadata, offset = read_header(path)
+    assert reps == [2, 2, 3]
+    assert metadata == {"benchmark": "fib", "vm": "pypy"}
+    assert offset % ALIGNMENT == 0
+
+    loaded, metadata = load_data(path)
+    assert metadata["vm"] == "pypy"
+    assert loaded.reps == data.reps
+    for index in data.index_iterator():
+        assert loaded[index] == data[index]
+    assert loaded.mean() == pytest.approx(data.mean())
+    assert loaded.Ti2(2) == pytest.approx(data.Ti2(2))
+    assert loaded.confidence95() == pytest.approx(data.confidence95())
+
+def test_load_maps_without_copying(data, tmpdir):
+    path = str(tmpdir.join("run.kal"))
+    write_data(path, data)
+    loaded, _ = load_data(path)
+    base = loaded.as_array()
+    while base.base is not None and isinstance(base.base, numpy.ndarray):
+        base = base.base
+    assert isinstance(base, numpy.memmap)
+    assert not loaded.as_array().flags.writeable
+
+def test_writer_chunks(tmpdir):
+    path = str(tmpdir.join("run.kal"))
+    with ColumnarWriter(path, [3, 2]) as writer:
+        for e in range(3):
+            writer.write([e, e + 0.5])
+    loaded, metadata = load_data(path)
+    assert metadata == {}
+    assert loaded.as_array().tolist() == [[0, 0.5], [1, 1.5], [2, 2.5]]
+
+def test_writer_counts_values(tmpdir):
+    path = str(tmpdir.join("run.kal"))
+    writer = ColumnarWriter(path, [2, 2])
+    with pytest.raises(ValueError):
+        writer.write(range(5))
+    writer.write(range(3))
+    with pytest.raises(ValueError):
+        writer.close()
+
+def test_bad_files(data, tmpdir):
+    path = tmpdir.join("bad.kal")
+    path.write("not a columnar file")
+    with pytest.raises(ValueError):
+        load_data(str(path))
+
+    path = str(tmpdir.join("run.kal"))
+    write_data(path, data)
+    with open(path, "r+b") as f:
+        f.truncate(ALIGNMENT + 8)
+    with pytest.raises(ValueError):
+        load_data(path)
@@ -0,0 +1,84 @@
+import random
+import pytest
+
+import support
+
+support.setup_paths()
+
+pytest.importorskip("numpy")
+
+from pykalibera.data import Data, bootstrap_geomean
+from pykalibera.compare import BootstrapComparison
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+def make_data(level, seed):
+    rng = random.Random(seed)
+    return Data(dict(((e, ), [level + rng.random() for i in range(5)])
+            for e in range(4)), [4, 5])
+
+@pytest.fixture
+def datasets():
+    """ Returns data for 3 VMs x 2 benchmarks, vm2 missing one benchmark """
+    return {
+        ("vm1", "fib"): make_data(10, 1),
+        ("vm1", "nbody"): make_data(20, 2),
+        ("vm2", "fib"): make_data(5, 3),
+        ("vm3", "fib"): make_data(20, 4),
+        ("vm3", "nbody"): make_data(10, 5),
+    }
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+def test_quotient(datasets):
+    comparison = BootstrapComparison(datasets, iterations=2000, seed=1)
+    assert comparison.vms == ["vm1", "vm2", "vm3"]
+    assert comparison.benchmarks == ["fib", "nbody"]
+
+    conf = comparison.quotient("vm1", "vm2", "fib")
+    expect = datasets["vm1", "fib"].bootstrap_quotient(datasets["vm2", "fib"],
+            2000, engine="weights", seed=1)
+    for got, want in zip(conf, expect):
+        assert abs(got - want) <= 0.05
+
+    matrix = comparison.quotient_matrix("nbody")
+    assert sorted(matrix) == [("vm1", "vm3"), ("vm3", "vm1")]
+    assert matrix["vm1", "vm3"].median > 1
+
+def test_reproducible(datasets):
+    comparison = BootstrapComparison(datasets, iterations=2000, seed=1)
+    subset = dict((key, data) for key, data in datasets.items()
+            if key[0] != "vm2")
+    other = BootstrapComparison(subset, iterations=2000, seed=1)
+
+    # A dataset's distribution does not depend on the other datasets.
+    assert comparison.quotient("vm1", "vm3", "fib") == \
+            other.quotient("vm1", "vm3", "fib")
+    assert comparison.geomean("vm1", "vm3") == other.geomean("vm1", "vm3")
+
+def test_geomean(datasets):
+    comparison = BootstrapComparison(datasets, iterations=2000, seed=1)
+
+    # A single benchmark gives back its quotient.
+    quotient = comparison.quotient("vm1", "vm2", "fib")
+    geomean = comparison.geomean("vm1", "vm2")
+    for a, b in zip(quotient, geomean):
+        assert abs(a - b) <= 1e-9
+
+    expect = bootstrap_geomean(
+            [datasets["vm1", "fib"], datasets["vm1", "nbody"]],
+            [datasets["vm3", "fib"], datasets["vm3", "nbody"]],
+            2000, engine="weights", seed=1)
+    got = comparison.geomean("vm1", "vm3")
+    for a, b in zip(got, expect):
+        assert abs(a - b) <= 0.02
+
+    matrix = comparison.geomean_matrix()
+    assert len(matrix) == 6
+    assert matrix["vm1", "vm3"] == got
+    with pytest.raises(ValueError):
+        comparison.geomean("vm2", "vm3", benchmarks=[])
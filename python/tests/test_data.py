@@ -7,6 +7,15 @@ support.setup_paths()
 
 from pykalibera.data import Data, _confidence_slice_indicies, _mean
 from pykalibera.data import confidence_slice, _geomean, bootstrap_geomean
+from pykalibera.data import confidence_slices
+from pykalibera.data import ArrayData, AdaptiveConfRange, ConfRange
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+needs_numpy = pytest.mark.skipif(numpy is None, reason="numpy not installed")
 
 # ----------------------------------
 # HELPER FIXTURES
@@ -382,3 +391,615 @@ def test_geomean_data():
 
     (_, mean, _) = bootstrap_geomean([data1, data2], [data2, data1])
     assert round(mean, 5) == 1.0
+
+@needs_numpy
+def test_array_data_indicies():
+    d = ArrayData({
+        (0, 0) : [1, 2, 3, 4, 5],
+        (0, 1) : [3, 4, 5, 6, 7]
+        }, [1, 2, 5])
+
+    assert d.data.shape == (1, 2, 5)
+    assert d[0, 0, 0] == 1
+    assert d[0, 0, 4] == 5
+    assert d[0, 1, 2] == 5
+
+@needs_numpy
+def test_array_data_bad_shape():
+    with pytest.raises(KeyError):
+        ArrayData({(0, ) : [1, 2]}, [2, 2])
+    with pytest.raises(ValueError):
+        ArrayData({(0, ) : [1, 2], (1, ) : [1]}, [2, 2])
+
+@needs_numpy
+def test_array_data_worked_example_3_level():
+    values = {
+        (0, 0): [9., 5.], (0, 1): [8., 3.],
+        (1, 0): [10., 6.], (1, 1): [7., 11.],
+        (2, 0): [1., 12.], (2, 1): [2., 4.],
+    }
+    data = Data(values, [3, 2, 2])
+    adata = ArrayData(values, [3, 2, 2])
+
+    for index in data.index_iterator(stop=2):
+        assert adata.mean(index) == data.mean(index)
+    assert adata.mean() == 6.5
+
+    for i in range(1, 4):
+        assert abs(adata.Si2(i) - data.Si2(i)) <= 1e-9
+        assert abs(adata.Ti2(i) - data.Ti2(i)) <= 1e-9
+    assert abs(adata.confidence95() - data.confidence95()) <= 1e-9
+
+@needs_numpy
+def test_array_data_optimal_reps():
+    d = ArrayData({
+        (0, 0) : [3,4,3],
+        (0, 1) : [1.2, 3.1, 3],
+        (1, 0) : [0.2, 1, 1.5],
+        (1, 1) : [1, 2, 3]
+    }, [2, 2, 3])
+
+    got = [d.optimalreps(i, (100, 20, 3), round=False) for i in [1,2]]
+    expect = [4.2937, 1.3023]
+
+    for i in range(len(got)):
+        assert abs(got[i] - expect[i]) <= 0.001
+
+@needs_numpy
+def test_array_data_from_buffer():
+    import array
+    buf = array.array("d", [9., 5., 8., 3., 10., 6., 7., 11., 1., 12., 2., 4.])
+    data = ArrayData.from_buffer(buf, [3, 2, 2])
+
+    assert data[1, 1, 0] == 7.
+    assert data.mean((2, )) == 4.75
+    # No copy was made.
+    buf[0] = 1.
+    assert data[0, 0, 0] == 1.
+
+@needs_numpy
+def test_array_data_bootstrap_matches_dict():
+    values = {
+            (0, ) : [ 2.5, 3.1, 2.7 ],
+            (1, ) : [ 5.1, 1.1, 2.3 ],
+            (2, ) : [ 4.7, 5.5, 7.1 ],
+            }
+    data = Data(values, [3, 3])
+    adata = ArrayData(values, [3, 3])
+
+    random.seed(1)
+    expect = data.bootstrap_means(10)
+    random.seed(1)
+    got = adata.bootstrap_means(10)
+    assert got == expect
+
+@needs_numpy
+def test_bootstrap_batched_engine():
+    data = Data({
+            (0, ) : [ 2.5, 3.1, 2.7 ],
+            (1, ) : [ 5.1, 1.1, 2.3 ],
+            (2, ) : [ 4.7, 5.5, 7.1 ],
+            }, [3, 3])
+
+    means = data.bootstrap_means(1000, engine="batched", seed=1)
+    assert len(means) == 1000
+    assert means == sorted(means)
+    assert means == data.bootstrap_means(1000, engine="batched", seed=1)
+    # The python engine draws from the same distribution.
+    random.seed(1)
+    assert abs(_mean(means) - _mean(data.bootstrap_means(1000))) <= 0.1
+    assert abs(_mean(means) - data.mean()) <= 0.1
+
+    # Tiny batches give the same distribution.
+    small = data.bootstrap_means(1000, engine="batched", seed=2,
+            max_batch_bytes=1)
+    assert abs(_mean(small) - _mean(means)) <= 0.1
+
+    with pytest.raises(ValueError):
+        data.bootstrap_means(10, engine="bogus")
+
+@needs_numpy
+def test_bootstrap_batched_engine_constant():
+    data = ArrayData({
+        (0, 0) : [2, 2, 2],
+        (0, 1) : [2, 2, 2],
+        (1, 0) : [2, 2, 2],
+        (1, 1) : [2, 2, 2],
+    }, [2, 2, 3])
+    conf = data.bootstrap_confidence_interval(100, engine="batched")
+    assert conf == (2, 2, 2)
+
+@needs_numpy
+def test_bootstrap_weights_engine():
+    data = Data({
+        (0, 0) : [3,4,3],
+        (0, 1) : [1.2, 3.1, 3],
+        (1, 0) : [0.2, 1, 1.5],
+        (1, 1) : [1, 2, 3]
+    }, [2, 2, 3])
+
+    means = data.bootstrap_means(2000, engine="weights", seed=1)
+    assert means == sorted(means)
+    assert means == data.bootstrap_means(2000, engine="weights", seed=1)
+
+    # Same distribution as the batched engine.
+    batched = data.bootstrap_means(2000, engine="batched", seed=1)
+    assert abs(_mean(means) - _mean(batched)) <= 0.05
+    for a, b in zip(confidence_slice(means), confidence_slice(batched)):
+        assert abs(a - b) <= 0.1
+
+@needs_numpy
+def test_multinomial_counts():
+    from pykalibera.data import _multinomial_counts
+    rng = numpy.random.RandomState(1)
+    trials = numpy.array([[0, 3], [7, 100]])
+    counts = _multinomial_counts(rng, trials, 4)
+    assert counts.shape == (2, 2, 4)
+    assert (counts.sum(axis=-1) == trials).all()
+    assert (counts >= 0).all()
+
+@needs_numpy
+def test_confidence_quotient_engine():
+    data1 = Data({
+            (0, ) : [ 2.9, 3.1, 3.0 ],
+            (1, ) : [ 3.1, 2.6, 3.3 ],
+            (2, ) : [ 3.2, 3.0, 2.9 ],
+            }, [3, 3])
+    data2 = Data({
+            (0, ) : [ 3.9, 4.1, 4.0 ],
+            (1, ) : [ 4.1, 3.6, 4.3 ],
+            (2, ) : [ 4.2, 4.0, 3.9 ],
+            }, [3, 3])
+    zero = Data({
+            (0, ) : [ 0, 0, 0],
+            (1, ) : [ 0, 0, 0],
+            (2, ) : [ 0, 0, 0],
+            }, [3, 3])
+
+    (_, mean1, _) = data1.bootstrap_quotient(data2)
+    (_, mean2, _) = data1.bootstrap_quotient(data2, engine="weights")
+    (_, mean3, _) = bootstrap_geomean([data1], [data2], engine="weights")
+    assert round(mean1, 2) == round(mean2, 2) == round(mean3, 2)
+
+    (_, median, _) = data1.bootstrap_quotient(zero, 10, engine="weights")
+    assert median == float("inf")
+
+@needs_numpy
+def test_bootstrap_workers_reproducible():
+    data1 = Data({
+            (0, ) : [ 2.9, 3.1, 3.0 ],
+            (1, ) : [ 3.1, 2.6, 3.3 ],
+            (2, ) : [ 3.2, 3.0, 2.9 ],
+            }, [3, 3])
+    data2 = Data({
+            (0, ) : [ 3.9, 4.1, 4.0 ],
+            (1, ) : [ 4.1, 3.6, 4.3 ],
+            (2, ) : [ 4.2, 4.0, 3.9 ],
+            }, [3, 3])
+
+    for engine in "batched", "weights":
+        expect = data1.bootstrap_means(2500, engine=engine, seed=3)
+        for workers in 1, 3:
+            assert data1.bootstrap_means(2500, engine=engine, seed=3,
+                    workers=workers) == expect
+
+    expect = data1.bootstrap_quotient(data2, 2500, engine="weights", seed=3)
+    got = data1.bootstrap_quotient(data2, 2500, engine="weights", seed=3,
+            workers=2)
+    assert got == expect
+
+    expect = bootstrap_geomean([data1, data2], [data2, data1], 2500,
+            engine="weights", seed=3)
+    got = bootstrap_geomean([data1, data2], [data2, data1], 2500,
+            engine="weights", seed=3, workers=2)
+    assert got == expect
+
+@needs_numpy
+def test_bootstrap_workers_pool_reused(monkeypatch):
+    import multiprocessing, multiprocessing.pool
+    pools = []
+    def pool(*args, **kwargs):
+        pools.append(multiprocessing.pool.Pool(*args, **kwargs))
+        return pools[-1]
+    monkeypatch.setattr(multiprocessing, "Pool", pool)
+
+    data1 = Data({
+            (0, ) : [ 2.9, 3.1, 3.0 ],
+            (1, ) : [ 3.1, 2.6, 3.3 ],
+            (2, ) : [ 3.2, 3.0, 2.9 ],
+            }, [3, 3])
+    data2 = Data({
+            (0, ) : [ 3.9, 4.1, 4.0 ],
+            (1, ) : [ 4.1, 3.6, 4.3 ],
+            (2, ) : [ 4.2, 4.0, 3.9 ],
+            }, [3, 3])
+
+    # Every round uses the pool made for the first.
+    conf = data1.bootstrap_quotient(data2, 20000, engine="weights", seed=1,
+            tolerance=1e9, workers=2)
+    assert conf.iterations == 5000
+    assert len(pools) == 1
+    assert conf == data1.bootstrap_quotient(data2, 20000, engine="weights",
+            seed=1, tolerance=1e9)
+    data1.bootstrap_confidence_interval(20000, engine="weights", seed=1,
+            tolerance=1e9, workers=2)
+    assert len(pools) == 2
+
+    # So do the blocks of the geometric mean.
+    got = bootstrap_geomean([data1], [data2], 3000, engine="weights",
+            seed=3, workers=2, max_batch_bytes=1)
+    assert len(pools) == 3
+    assert got == bootstrap_geomean([data1], [data2], 3000,
+            engine="weights", seed=3, max_batch_bytes=1)
+
+def test_bootstrap_workers_needs_engine():
+    data = Data({(0, ) : [1, 2], (1, ) : [3, 4]}, [2, 2])
+    with pytest.raises(ValueError):
+        data.bootstrap_means(10, workers=2)
+
+def test_variance_components():
+    data = Data({
+        (0, 0): [9., 5.], (0, 1): [8., 3.],
+        (1, 0): [10., 6.], (1, 1): [7., 11.],
+        (2, 0): [1., 12.], (2, 1): [2., 4.],
+    }, [3, 2, 2])
+
+    got = [(round(s, 1), round(t, 1)) for s, t in data.variance_components()]
+    assert got == [(16.5, 16.5), (2.6, -5.7), (3.6, 2.3)]
+
+    # The same as computing S_i^2 from the definition.
+    for i in range(1, 4):
+        index = data.n - i
+        total = 0.0
+        for prefix in data.index_iterator(stop=index + 1):
+            total += (data.mean(prefix) - data.mean(prefix[:-1])) ** 2
+        factor = 1.0 / (data.reps[index] - 1)
+        for rep in data.reps[:index]:
+            factor /= rep
+        assert abs(data.Si2(i) - factor * total) <= 1e-9
+
+    if numpy is not None:
+        adata = ArrayData(data.data, data.reps)
+        for (s1, t1), (s2, t2) in zip(data.variance_components(),
+                adata.variance_components()):
+            assert abs(s1 - s2) <= 1e-9
+            assert abs(t1 - t2) <= 1e-9
+
+def test_variance_components_single_rep():
+    d = Data({
+        (0, 0) : [0, 2]
+    }, [1, 1, 2])
+
+    assert d.Si2(1) == 2
+    assert math.isnan(d.Si2(2))
+    assert math.isnan(d.Ti2(3))
+
+def test_memoize_cache():
+    d = Data({
+        (0, 0) : [3,4,3],
+        (0, 1) : [1.2, 3.1, 3],
+        (1, 0) : [0.2, 1, 1.5],
+        (1, 1) : [1, 2, 3]
+    }, [2, 2, 3], cache_size=2)
+
+    d.mean((0, ))
+    d.mean((0, ))
+    info = d.cache_info()
+    assert (info.hits, info.misses, info.evictions) == (1, 1, 0)
+    assert (info.maxsize, info.currsize) == (2, 1)
+
+    d.mean((1, ))
+    d.mean((0, )) # (0, ) is now the most recently used
+    d.mean((0, 0))
+    info = d.cache_info()
+    assert (info.hits, info.misses, info.evictions) == (2, 3, 1)
+    assert info.currsize == 2
+    d.mean((0, ))
+    assert d.cache_info().hits == 3
+
+    d.clear_cache()
+    assert d.cache_info().currsize == 0
+    assert d.cache_info().hits == 3
+
+def test_memoize_cache_keys():
+    d = Data({
+        (0, 0) : [3,4,3],
+        (0, 1) : [1.2, 3.1, 3],
+        (1, 0) : [0.2, 1, 1.5],
+        (1, 1) : [1, 2, 3]
+    }, [2, 2, 3])
+
+    # Unhashable costs are fine, and share an entry with the tuple version.
+    a = d.optimalreps(1, [100, 20, 3])
+    b = d.optimalreps(1, (100, 20, 3))
+    assert a == b == 5
+    assert d.cache_info().hits >= 1
+
+    # Keyword arguments are part of the key.
+    assert type(d.optimalreps(1, (100, 20, 3), round=False)) == float
+
+def test_validate():
+    values = {
+        (0, 0) : [1, 2, 3],
+        (0, 1) : [3, 4, 5],
+    }
+    for validate in "full", "shape", "none":
+        d = Data(values, [1, 2, 3], validate=validate)
+        assert d.mean() == 3
+
+    with pytest.raises(KeyError):
+        Data({(0, 0) : [1, 2, 3]}, [1, 2, 3])
+    with pytest.raises(IndexError):
+        Data({(0, 0) : [1, 2, 3], (0, 1) : [1, 2]}, [1, 2, 3])
+    # Not checked by "none".
+    Data({(0, 0) : [1, 2, 3]}, [1, 2, 3], validate="none")
+    with pytest.raises(ValueError):
+        Data(values, [1, 2, 3], validate="bogus")
+
+def test_validate_shape():
+    bad = [
+        {(0, 0) : [1, 2, 3]}, # missing a list
+        {(0, 0) : [1, 2, 3], (0, 2) : [1, 2, 3]}, # out of range
+        {(0, 0) : [1, 2, 3], (0, 1, 0) : [1, 2, 3]}, # too long a key
+        {(0, 0) : [1, 2, 3], (0, 1) : [1, 2]}, # too few values
+        {(0, 0) : [1, 2, 3], (0, 1) : [1, 2, 3, 4]}, # too many values
+        {(0, 0) : [1, 2, 3], (0, 1) : [1, 2, 3], (0, 2) : [1, 2, 3]},
+        {(0, 0) : [1, 2, 3], 0 : [1, 2, 3]}, # not a tuple
+        {(0, 0) : [1, 2, 3], (0, ) : [1, 2, 3]}, # too short a key
+    ]
+    for values in bad:
+        with pytest.raises(ValueError):
+            Data(values, [1, 2, 3], validate="shape")
+    with pytest.raises(ValueError):
+        Data({0 : [1, 2, 3]}, [1, 3], validate="shape")
+
+def test_adaptive_bootstrap_converges():
+    data = Data({
+            (0, ) : [ 2.9, 3.1, 3.0 ],
+            (1, ) : [ 3.1, 2.6, 3.3 ],
+            (2, ) : [ 3.2, 3.0, 2.9 ],
+            }, [3, 3])
+    random.seed(1)
+    conf = data.bootstrap_confidence_interval(10000, tolerance=0.01,
+            round_iterations=500)
+    assert isinstance(conf, AdaptiveConfRange)
+    assert isinstance(conf, ConfRange)
+    assert conf.iterations < 10000
+    assert conf.iterations % 500 == 0
+    assert conf.endpoint_error <= 0.01 * conf.median
+    assert conf.lower < conf.median < conf.upper
+
+def test_adaptive_bootstrap_cap():
+    data = Data({
+            (0, ) : [ 2.5, 3.1, 2.7 ],
+            (1, ) : [ 5.1, 1.1, 2.3 ],
+            (2, ) : [ 4.7, 5.5, 7.1 ],
+            }, [3, 3])
+    random.seed(1)
+    conf = data.bootstrap_confidence_interval(300, tolerance=1e-9,
+            round_iterations=100)
+    assert conf.iterations == 300
+    assert conf.endpoint_error > 1e-9 * conf.median
+
+def test_adaptive_bootstrap_min_rounds():
+    data = Data({
+            (0, ) : [ 2.9, 3.1, 3.0 ],
+            (1, ) : [ 3.1, 2.6, 3.3 ],
+            (2, ) : [ 3.2, 3.0, 2.9 ],
+            }, [3, 3])
+    random.seed(1)
+    # Any estimate of the error meets such a tolerance, so the rounds stop
+    # as soon as they may.
+    conf = data.bootstrap_confidence_interval(10000, tolerance=1e9,
+            round_iterations=100)
+    assert conf.iterations == 500
+    conf = data.bootstrap_confidence_interval(10000, tolerance=1e9,
+            round_iterations=100, min_rounds=8)
+    assert conf.iterations == 800
+    with pytest.raises(ValueError):
+        data.bootstrap_confidence_interval(10000, tolerance=1e9,
+                round_iterations=100, min_rounds=2)
+
+@needs_numpy
+def test_adaptive_bootstrap_engine():
+    data1 = Data({
+            (0, ) : [ 2.9, 3.1, 3.0 ],
+            (1, ) : [ 3.1, 2.6, 3.3 ],
+            (2, ) : [ 3.2, 3.0, 2.9 ],
+            }, [3, 3])
+    data2 = Data({
+            (0, ) : [ 3.9, 4.1, 4.0 ],
+            (1, ) : [ 4.1, 3.6, 4.3 ],
+            (2, ) : [ 4.2, 4.0, 3.9 ],
+            }, [3, 3])
+
+    conf = data1.bootstrap_quotient(data2, 20000, engine="weights", seed=1,
+            tolerance=0.005)
+    assert conf.iterations < 20000
+    # The rounds continue the same random streams, so the result is the
+    # same as a fixed run of as many iterations.
+    fixed = data1.bootstrap_quotient(data2, conf.iterations, engine="weights",
+            seed=1)
+    assert tuple(conf) == tuple(fixed)
+
+    with pytest.raises(ValueError):
+        data1.bootstrap_confidence_interval(3000, engine="weights",
+                tolerance=0.01, round_iterations=1500)
+
+def test_confidence_slices():
+    means = [float(x) for x in range(1000)]
+    random.shuffle(means)
+
+    got = confidence_slices(means, ["0.8", "0.95", "0.99"])
+    expect = [(100, 499.5, 899), (25, 499.5, 974), (5, 499.5, 994)]
+    assert got == expect
+    for conf in got:
+        assert isinstance(conf, ConfRange)
+    assert confidence_slice(means, "0.8") == got[0]
+    # The input is left alone.
+    assert means != sorted(means)
+
+@needs_numpy
+def test_confidence_slice_array():
+    means = numpy.arange(11, dtype=float)[::-1]
+    low, median, high = confidence_slice(means, '0.8')
+    assert (low, median, high) == (1, 5, 9)
+    assert type(low) == float
+
+    means = numpy.array([1.0, float("inf"), 2.0])
+    assert confidence_slice(means, '0.5').upper == float("inf")
+
+def test_geomean_no_overflow():
+    assert abs(_geomean([1e200, 1e200, 1e-100]) / 1e100 - 1) <= 1e-12
+    assert abs(_geomean([1e-200, 1e-200, 1e100]) / 1e-100 - 1) <= 1e-12
+    assert _geomean([0, 1e300, 1e300]) == 0
+
+@needs_numpy
+def test_geomean_engine_blocks():
+    l_data = [Data({
+        (0, ) : [ 2.9 + i, 3.1, 3.0 ],
+        (1, ) : [ 3.1, 2.6 + i, 3.3 ],
+        }, [2, 3]) for i in range(5)]
+    l_data_b = l_data[1:] + l_data[:1]
+
+    expect = bootstrap_geomean(l_data, l_data_b, 3000, engine="weights",
+            seed=1)
+    # Blocks of a single chunk of iterations give the same result. This
+    # is just enough memory for the engine to still draw whole chunks at
+    # once.
+    got = bootstrap_geomean(l_data, l_data_b, 3000, engine="weights", seed=1,
+            max_batch_bytes=150000)
+    assert got == expect
+
+    random.seed(1)
+    slow = bootstrap_geomean(l_data, l_data_b, 300)
+    for a, b in zip(got, slow):
+        assert abs(a - b) <= 0.05
+
+def test_collapse():
+    d = Data({
+        (0, 0) : [1, 2, 3],
+        (0, 1) : [3, 4, 5],
+        (1, 0) : [2, 4, 6],
+        (1, 1) : [1, 1, 4],
+        }, [2, 2, 3])
+
+    top = d.collapse(1)
+    assert top.reps == [2]
+    assert top[0, ] == 3 and top[1, ] == 3
+    two = d.collapse(2)
+    assert two.reps == [2, 2]
+    assert two[1, 0] == 4 and two[1, 1] == 2
+    assert two.mean() == d.mean()
+    assert d.collapse(3) is d
+    assert d.collapse(1) is top # memoized
+    with pytest.raises(ValueError):
+        d.collapse(0)
+
+    if numpy is not None:
+        a = ArrayData(d.data, d.reps)
+        assert a.collapse(2).as_array().tolist() == [[2, 4], [4, 2]]
+
+def test_resample_levels():
+    d = Data({
+        (0, ) : [1, 2, 3, 2],
+        (1, ) : [3, 4, 5, 6],
+        (2, ) : [2, 4, 6, 2],
+        }, [3, 4])
+    top = Data({(): [2, 4.5, 3.5]}, [3])
+
+    random.seed(3)
+    means = d.bootstrap_means(200, resample_levels=1)
+    random.seed(3)
+    assert means == top.bootstrap_means(200)
+    # Only the 10 multisets of 3 execution means can be drawn.
+    assert len(set(means)) <= 10
+
+    random.seed(4)
+    ci = d.bootstrap_confidence_interval(200, resample_levels=1)
+    random.seed(4)
+    assert ci == top.bootstrap_confidence_interval(200)
+
+    random.seed(5)
+    full = d.bootstrap_means(100)
+    random.seed(5)
+    assert d.bootstrap_means(100, resample_levels=2) == full
+
+@needs_numpy
+def test_resample_levels_engines():
+    d = Data(dict(((e, i), [e + i + j * 0.5 for j in range(4)])
+            for e in range(4) for i in range(3)), [4, 3, 4])
+    other = ArrayData(d.data, d.reps)
+
+    for engine in ("batched", "weights"):
+        ci = d.bootstrap_confidence_interval(2000, engine=engine, seed=1,
+                resample_levels=2)
+        assert ci == d.collapse(2).bootstrap_confidence_interval(2000,
+                engine=engine, seed=1)
+
+    q = d.bootstrap_quotient(other, 2000, engine="weights", seed=2,
+            resample_levels=1)
+    assert q == d.collapse(1).bootstrap_quotient(other.collapse(1), 2000,
+            engine="weights", seed=2)
+    g = bootstrap_geomean([d], [other], 2000, engine="weights", seed=2,
+            resample_levels=1)
+    assert g == bootstrap_geomean([d.collapse(1)], [other.collapse(1)], 2000,
+            engine="weights", seed=2)
+
+def test_quotient_confidence_interval():
+    rng = random.Random(1)
+    a = Data(dict(((e, ), [10 + rng.gauss(0, 1) for i in range(20)])
+            for e in range(10)), [10, 20])
+    b = Data(dict(((e, ), [5 + rng.gauss(0, 1) for i in range(20)])
+            for e in range(10)), [10, 20])
+
+    fieller = a.quotient_confidence_interval(b)
+    delta = a.quotient_confidence_interval(b, method="delta")
+    assert fieller.median == delta.median == a.mean() / b.mean()
+    assert fieller.lower < fieller.median < fieller.upper
+    # Fieller's interval is skewed towards larger quotients.
+    assert fieller.upper - fieller.median > fieller.median - fieller.lower
+    for x, y in zip(fieller, delta):
+        assert abs(x - y) < 0.01
+
+    random.seed(1)
+    boot = a.bootstrap_quotient(b, 1000, resample_levels=1)
+    assert abs(fieller.lower - boot.lower) < 0.05
+    assert abs(fieller.upper - boot.upper) < 0.05
+
+    assert a.quotient_confidence_interval(b, method="auto") == fieller
+    with pytest.raises(ValueError):
+        a.quotient_confidence_interval(b, method="bogus")
+    with pytest.raises(TypeError):
+        a.quotient_confidence_interval(b, iterations=10)
+
+def test_quotient_confidence_interval_denominator_near_zero():
+    a = Data({(0, ): [1, 2], (1, ): [2, 3], (2, ): [1, 3]}, [3, 2])
+    b = Data({(0, ): [-1, 1], (1, ): [2, 2], (2, ): [0, 1]}, [3, 2])
+
+    with pytest.raises(ValueError):
+        a.quotient_confidence_interval(b)
+    random.seed(2)
+    expect = a.bootstrap_quotient(b, 100)
+    random.seed(2)
+    assert a.quotient_confidence_interval(b, method="auto",
+            iterations=100) == expect
+
+    single = Data({(0, ): [1, 2]}, [1, 2])
+    with pytest.raises(ValueError):
+        a.quotient_confidence_interval(single, method="delta")
+
+def test_quotient_confidence_interval_auto_unequal_reps():
+    # The interval of b alone is within max_denominator_error of its mean,
+    # but the few top level repetitions of a make Fieller's t much larger.
+    a = Data({(0, ): [1, 1], (1, ): [100, 100]}, [2, 2])
+    b = Data(dict(((e, ), [10 + 16.5 * (-1) ** e] * 2) for e in range(100)),
+            [100, 2])
+    assert b.confidence95() < 0.3 * b.mean()
+    with pytest.raises(ValueError):
+        a.quotient_confidence_interval(b)
+    random.seed(3)
+    expect = a.bootstrap_quotient(b, 100)
+    random.seed(3)
+    assert a.quotient_confidence_interval(b, method="auto",
+            iterations=100) == expect
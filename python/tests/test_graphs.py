@@ -5,7 +5,15 @@ import support
 
 support.setup_paths()
 
+try:
+    import matplotlib
+    matplotlib.use("Agg") # Render without a display.
+except ImportError:
+    pass
+
 from pykalibera.graphs import run_sequence_plot, lag_plot, acr_plot
+from pykalibera.graphs import autocorrelation, _downsample
+from pykalibera.graphs import render_plots, PlotJob, GraphError
 
 # ----------------------------------
 # HELPER FIXTURES
@@ -37,3 +45,62 @@ def test_lag(gpath, rdata):
 def test_acr(gpath, rdata):
     # Does not crash
     acr_plot(rdata, filename=gpath)
+
+def test_autocorrelation(rdata):
+    lags, acf = autocorrelation(rdata, 10)
+    assert list(lags) == list(range(11))
+    assert acf[0] == pytest.approx(1)
+
+    # Matches the direct, quadratic definition.
+    mean = sum(rdata) / float(len(rdata))
+    centred = [x - mean for x in rdata]
+    var = sum(x * x for x in centred)
+    for lag in (1, 5, 10):
+        expect = sum(a * b for a, b in zip(centred, centred[lag:])) / var
+        assert acf[lag] == pytest.approx(expect)
+
+    lags, acf = autocorrelation([1.0, 2.0, 3.0])
+    assert len(acf) == 3
+    assert acf[2] == pytest.approx(-0.5)
+
+def test_downsample():
+    data = [float(i % 7) for i in range(1000)]
+    data[500] = 100.0
+    xs, ys = _downsample(data, 50)
+    assert len(xs) == len(ys) == 100
+    assert max(ys) == 100.0 and min(ys) == 0.0
+    xs, ys = _downsample(data[:80], 50)
+    assert list(ys) == data[:80]
+
+def test_run_sequence_long(tmpdir):
+    path = tmpdir.join("long.png").strpath
+    run_sequence_plot([random.random() for i in range(200000)],
+            filename=path)
+    assert os.path.getsize(path) > 0
+
+def test_explicit_axes(tmpdir, rdata):
+    path = tmpdir.join("acr.png").strpath
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    lag_plot(rdata, ax=ax)
+    assert ax.get_title() == "Lag 5 plot"
+    acr_plot(rdata, ax=ax, filename=path, maxlag=20)
+    assert ax.get_title() == "ACR Plot"
+    assert os.path.getsize(path) > 0
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_render_plots(tmpdir, rdata, workers):
+    jobs = [PlotJob(kind, rdata, tmpdir.join("%s.png" % kind).strpath)
+            for kind in ("run_sequence", "lag", "acr")]
+    jobs.append(("lag", rdata, tmpdir.join("lag1.png").strpath, {"lag": 1}))
+    filenames = render_plots(jobs, workers=workers, figsize=(4, 3), dpi=50)
+    assert filenames == [job[2] for job in jobs]
+    for filename in filenames:
+        with open(filename, "rb") as f:
+            assert f.read(4) == b"\x89PNG"
+
+    with pytest.raises(GraphError):
+        render_plots([("pie", rdata, tmpdir.join("pie.png").strpath)])
@@ -0,0 +1,71 @@
+import json, os.path, subprocess, sys
+import pytest
+
+import support
+
+support.setup_paths()
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+# Generous, as it includes compiling the modules when there is no .pyc.
+IMPORT_BUDGET = 0.25 # seconds
+
+SLOW_MODULES = ["numpy", "matplotlib", "decimal", "multiprocessing", "bz2"]
+
+def import_in_subprocess(statement):
+    """ Runs statement in a fresh interpreter, returning how long it took
+    and which of SLOW_MODULES it imported """
+    parent = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    code = """
+import sys, time, json
+sys.path.insert(0, %r)
+start = time.time()
+%s
+took = time.time() - start
+print(json.dumps([took, [m for m in %r if m in sys.modules]]))
+""" % (parent, statement, SLOW_MODULES)
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return json.loads(output.decode("utf-8").splitlines()[-1])
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+def test_import_data_is_cheap():
+    took, loaded = import_in_subprocess("import pykalibera.data")
+    assert loaded == []
+    assert took < IMPORT_BUDGET
+
+def test_import_graphs_is_cheap():
+    took, loaded = import_in_subprocess("import pykalibera.graphs")
+    assert loaded == []
+    assert took < IMPORT_BUDGET
+
+def test_mean_needs_no_slow_modules():
+    _, loaded = import_in_subprocess(
+            "from pykalibera.data import Data\n"
+            "Data({(0, ): [1, 2], (1, ): [3, 4]}, [2, 2]).mean()")
+    assert loaded == []
+
+def test_lazy_t_table():
+    from pykalibera.data import student_t_quantile95
+    assert student_t_quantile95(1) == 6.313752
+    assert student_t_quantile95(10000) == 1.646379
+
+def test_t_table():
+    from pykalibera.data import student_t_quantiles
+    table = student_t_quantiles()
+    assert len(table) == 1000
+    assert table[0] == 6.313752
+    assert table[-1] == 1.646379
+    assert student_t_quantiles() is table
+
+def test_lazy_module():
+    from pykalibera.data import _LazyModule
+    missing = _LazyModule("pykalibera_no_such_module")
+    assert not missing
+    with pytest.raises(ImportError):
+        missing.array
+    assert _LazyModule("json").dumps([1]) == "[1]"
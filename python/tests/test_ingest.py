@@ -0,0 +1,94 @@
+import bz2, io, json
+import pytest
+
+import support
+
+support.setup_paths()
+
+from pykalibera.ingest import iter_krun_results
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+RESULTS = {
+    "audit": {"uname": "Linux", "packages": ["a", "b"]},
+    "core_cycle_counts": {"fib:pypy:default-python": [[[1, 2, 3]]]},
+    "wallclock_times": {
+        "fib:pypy:default-python": [
+            [3.0, 1.0, 1.25, 1.5],
+            [2.5, 1.0, 1.0, 1.125],
+            [],
+        ],
+        "nbody:cpython:default-python": [
+            [2.0, 2.0, 2.5, 2.0],
+            [2.0, 2.25, 2.0, 2.125],
+        ],
+        "richards:cpython:default-python": [[], []],
+    },
+    "eta_estimates": {"fib:pypy:default-python": [1.5e-05, 2.25]},
+}
+
+def as_file(results):
+    return io.StringIO(json.dumps(results, indent=1).decode("utf-8"))
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_krun_results(chunk_size):
+    results = dict(iter_krun_results(as_file(RESULTS), chunk_size=chunk_size))
+    assert sorted(results) == [("fib", "pypy", "default-python"),
+            ("nbody", "cpython", "default-python")]
+
+    fib = results["fib", "pypy", "default-python"]
+    assert fib.reps == [2, 4]
+    assert fib[1, 3] == 1.125
+    assert fib.mean() == sum(RESULTS["wallclock_times"]
+            ["fib:pypy:default-python"][0] + [2.5, 1.0, 1.0, 1.125]) / 8
+
+def test_floats_split_across_chunks():
+    # Krun writes the sections in any order. A float section read before
+    # wallclock_times is skipped a number at a time, so numbers such as
+    # "0.5" end up split at every position across chunk boundaries.
+    etas = json.dumps({"fib:pypy:default-python":
+            [0.5, 1e-05, 2.5e+3, -0.125, 10.0] * 4})
+    walls = json.dumps(RESULTS["wallclock_times"])
+    text = u'{"eta_estimates": %s, "wallclock_times": %s}' % (etas, walls)
+    for chunk_size in range(1, 40):
+        results = dict(iter_krun_results(io.StringIO(text),
+                chunk_size=chunk_size))
+        assert results["fib", "pypy", "default-python"].reps == [2, 4]
+
+def test_warmup():
+    warmup = {("fib", "pypy", "default-python"): 1}
+    results = dict(iter_krun_results(as_file(RESULTS), warmup=warmup))
+    assert results["fib", "pypy", "default-python"].reps == [2, 3]
+    assert results["fib", "pypy", "default-python"][0, 0] == 1.0
+    assert results["nbody", "cpython", "default-python"].reps == [2, 4]
+
+    results = dict(iter_krun_results(as_file(RESULTS), warmup=2))
+    assert results["nbody", "cpython", "default-python"][1, 0] == 2.0
+    with pytest.raises(ValueError):
+        list(iter_krun_results(as_file(RESULTS), warmup=4))
+
+def test_bz2_path(tmpdir):
+    path = str(tmpdir.join("results.json.bz2"))
+    f = bz2.BZ2File(path, "w")
+    f.write(json.dumps(RESULTS))
+    f.close()
+    keys = [key for key, data in iter_krun_results(path, chunk_size=16)]
+    assert len(keys) == 2
+
+def test_ragged_executions():
+    results = {"wallclock_times": {"fib:pypy:default": [[1.0, 2.0], [1.0]]}}
+    with pytest.raises(ValueError):
+        list(iter_krun_results(as_file(results)))
+
+def test_malformed():
+    with pytest.raises(ValueError):
+        list(iter_krun_results(io.StringIO(u'{"wallclock_times": [')))
+    results = {"wallclock_times": {"fib-pypy": [[1.0]]}}
+    with pytest.raises(ValueError):
+        list(iter_krun_results(as_file(results)))
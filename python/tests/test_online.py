@@ -0,0 +1,156 @@
+import random
+import pytest
+
+import support
+
+support.setup_paths()
+
+from pykalibera.data import Data
+from pykalibera.online import DataBuilder, RunningStats, SequentialSampler
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+@pytest.fixture
+def values():
+    """ Returns the data of the three level worked example """
+    return {
+        (0, 0): [9., 5.], (0, 1): [8., 3.],
+        (1, 0): [10., 6.], (1, 1): [7., 11.],
+        (2, 0): [1., 12.], (2, 1): [2., 4.],
+    }
+
+def close(a, b):
+    return abs(a - b) <= 1e-9
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+def test_running_stats():
+    stats = RunningStats()
+    for x in [2., 4., 4., 4., 5., 5., 7., 9.]:
+        stats.add(x)
+    assert stats.count == 8
+    assert stats.mean == 5
+    assert close(stats.m2, 32)
+
+def test_builder_matches_data(values):
+    data = Data(values, [3, 2, 2])
+    builder = DataBuilder([2, 2])
+
+    # Interleave the executions of each compilation.
+    for i in range(2):
+        for index in sorted(values):
+            builder.add(index, values[index][i])
+
+    assert builder.complete == 3
+    assert close(builder.mean(), data.mean())
+    for i in range(1, 4):
+        assert close(builder.Si2(i), data.Si2(i))
+        assert close(builder.Ti2(i), data.Ti2(i))
+    assert close(builder.confidence95(), data.confidence95())
+
+    frozen = builder.freeze()
+    assert frozen.reps == [3, 2, 2]
+    assert frozen.data == values
+
+def test_builder_incomplete(values):
+    builder = DataBuilder([2, 2])
+    with pytest.raises(ValueError):
+        builder.mean()
+
+    # All of the first two compilations, half of the third.
+    for index in sorted(values):
+        for value in values[index][:1 if index[0] == 2 else 2]:
+            builder.add(index, value)
+
+    # The third compilation is not complete, so is not taken into account.
+    partial = Data(dict((k, v) for k, v in values.items() if k[0] < 2),
+            [2, 2, 2])
+    assert builder.complete == 2
+    assert close(builder.mean(), partial.mean())
+    for i in range(1, 4):
+        assert close(builder.Si2(i), partial.Si2(i))
+    assert builder.freeze().data == partial.data
+
+def test_builder_bad_input():
+    builder = DataBuilder([2, 2])
+    with pytest.raises(ValueError):
+        builder.add((0, ), 1.)
+    with pytest.raises(ValueError):
+        builder.add((0, 2), 1.)
+
+    builder.add((0, 0), 1.)
+    builder.add((0, 0), 1.)
+    with pytest.raises(ValueError):
+        builder.add((0, 0), 1.)
+
+    builder.add((0, 1), 1.)
+    builder.add((0, 1), 1.)
+    with pytest.raises(ValueError):
+        builder.add((0, 1), 1.)
+
+def test_builder_without_values():
+    builder = DataBuilder([4], keep_values=False)
+    for execution in "abc":
+        for i in range(4):
+            builder.add((execution, ), random.random())
+    assert builder.complete == 3
+    with pytest.raises(ValueError):
+        builder.freeze()
+
+def test_builder_optimalreps():
+    values = {
+        (0, 0) : [3,4,3],
+        (0, 1) : [1.2, 3.1, 3],
+        (1, 0) : [0.2, 1, 1.5],
+        (1, 1) : [1, 2, 3]
+    }
+    builder = DataBuilder([2, 3])
+    for index in sorted(values):
+        for value in values[index]:
+            builder.add(index, value)
+
+    got = [builder.optimalreps(i, [100, 20, 3], round=False) for i in [1, 2]]
+    expect = [4.2937, 1.3023]
+    for i in range(len(got)):
+        assert abs(got[i] - expect[i]) <= 0.001
+    assert [builder.r(i) for i in [1, 2, 3]] == [3, 2, 2]
+
+def test_sequential_sampler_stops():
+    random.seed(1)
+    sampler = SequentialSampler([10], [20., 1.], target=0.01)
+    decisions = []
+    for execution in range(100):
+        for i in range(10):
+            decision = sampler.add((execution, ), 10 + random.random())
+            if i < 9:
+                assert decision is None
+        decisions.append(decision)
+        if decision.stop:
+            break
+
+    assert decision.stop
+    assert decision.complete == len(decisions) >= 3
+    assert decision.half_width <= 0.01 * decision.mean
+    assert not any(d.stop for d in decisions[:-1])
+    assert decisions[0].half_width is None
+    assert decisions[0].recommended_reps == [None]
+    assert len(decision.recommended_reps) == 1
+
+def test_sequential_sampler_max_complete():
+    random.seed(1)
+    sampler = SequentialSampler([2, 5], [100., 20., 1.], target=1e-9,
+            max_complete=4)
+    for execution in range(4):
+        for j in range(2):
+            for i in range(5):
+                decision = sampler.add((execution, j), random.random())
+    assert decision.stop
+    assert decision.complete == 4
+    assert decision.half_width > 1e-9
+
+    with pytest.raises(ValueError):
+        SequentialSampler([2, 5], [1., 1.], target=0.1)
@@ -0,0 +1,72 @@
+import random
+import pytest
+
+import support
+
+support.setup_paths()
+
+from pykalibera.data import Data
+from pykalibera.planner import plan_experiment
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+def pilot(noise, executions=5, iterations=10, seed=0):
+    """ Returns a pilot Data of executions x iterations around 10 """
+    rng = random.Random(seed)
+    data = {}
+    for e in range(executions):
+        offset = rng.gauss(0, noise)
+        data[(e, )] = [10 + offset + rng.gauss(0, noise)
+                for i in range(iterations)]
+    return Data(data, [executions, iterations])
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+def test_plan_fits_budget():
+    pilots = {
+        ("fib", "vm1"): pilot(0.1, seed=1),
+        ("fib", "vm2"): pilot(1.0, seed=2),
+        ("nbody", "vm1"): pilot(0.5, seed=3),
+    }
+    costs = [5., 1.]
+    plan = plan_experiment(pilots, costs, budget=3000)
+
+    assert set(plan) == set(pilots)
+    assert sum(entry.cost for entry in plan.values()) <= 3000
+    for key, entry in plan.items():
+        data = pilots[key]
+        assert len(entry.reps) == 2
+        assert entry.reps[0] >= 2
+        assert entry.reps[1] == data.optimalreps(1, costs)
+        assert entry.cost == entry.reps[0] * (5 + entry.reps[1] * 1)
+        assert entry.expected_half_width > 0
+
+    # Noisier benchmarks get more executions.
+    assert plan[("fib", "vm2")].reps[0] > plan[("fib", "vm1")].reps[0]
+    # Not much of the budget is left over.
+    left = 3000 - sum(entry.cost for entry in plan.values())
+    assert left < max(entry.cost / entry.reps[0] for entry in plan.values())
+
+def test_plan_bigger_budget_is_more_precise():
+    pilots = {"a": pilot(0.3, seed=1), "b": pilot(0.6, seed=2)}
+    small = plan_experiment(pilots, [5., 1.], budget=1000)
+    big = plan_experiment(pilots, [5., 1.], budget=10000)
+    for key in pilots:
+        assert big[key].expected_half_width < small[key].expected_half_width
+
+def test_plan_per_key_costs():
+    pilots = {"cheap": pilot(0.5, seed=1), "dear": pilot(0.5, seed=1)}
+    plan = plan_experiment(pilots, {"cheap": [5., 1.], "dear": [50., 10.]},
+            budget=20000)
+    assert plan["cheap"].reps[0] > plan["dear"].reps[0]
+
+def test_plan_budget_too_small():
+    pilots = {"a": pilot(0.3), "b": pilot(0.6)}
+    with pytest.raises(ValueError):
+        plan_experiment(pilots, [5., 1.], budget=10)
+    with pytest.raises(ValueError):
+        plan_experiment(pilots, [5., 1., 1.], budget=1000)
@@ -0,0 +1,69 @@
+import json, random
+import pytest
+
+import support
+
+support.setup_paths()
+
+from pykalibera.data import Data
+from pykalibera.summary import DataSummary
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+def make_shard(first, count, rng):
+    """ Returns top level repetitions first to first + count - 1 of a 3 level
+    experiment """
+    return dict(((e, i), [rng.uniform(1, 2) * 10 ** rng.randint(-3, 3)
+                for j in range(5)])
+            for e in range(first, first + count) for i in range(3))
+
+def renumber(shard, first):
+    return dict(((e - first, i), values) for (e, i), values in shard.items())
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+def test_merge_is_exact():
+    rng = random.Random(7)
+    shards = [(0, 4), (4, 1), (5, 3), (8, 6)]
+    raw = [make_shard(first, count, rng) for first, count in shards]
+    whole = {}
+    for shard in raw:
+        whole.update(shard)
+    expect = Data(whole, [14, 3, 5])
+
+    summaries = [DataSummary.from_data(Data(renumber(shard, first),
+                [count, 3, 5]))
+            for shard, (first, count) in zip(raw, shards)]
+    # Merge in a different grouping and order, via JSON.
+    summaries = [DataSummary.from_dict(json.loads(json.dumps(s.to_dict())))
+            for s in summaries]
+    merged = summaries[3].merge(summaries[1]).merge(
+            summaries[2].merge(summaries[0]))
+
+    assert merged.reps == expect.reps
+    assert merged.mean() == expect.mean()
+    for i in range(1, 4):
+        assert merged.Si2(i) == expect.Si2(i)
+        assert merged.Ti2(i) == expect.Ti2(i)
+    assert merged.confidence95() == expect.confidence95()
+    assert DataSummary.merge_all(summaries).variance_components() == \
+            expect.variance_components()
+
+def test_single_level():
+    a = Data({(): [1, 2, 3.5]}, [3])
+    b = Data({(): [4, 0.25]}, [2])
+    merged = DataSummary.from_data(a).merge(DataSummary.from_data(b))
+    expect = Data({(): [1, 2, 3.5, 4, 0.25]}, [5])
+    assert merged.mean() == expect.mean()
+    assert merged.Si2(1) == expect.Si2(1)
+    assert merged.confidence95() == expect.confidence95()
+
+def test_merge_mismatched_reps():
+    a = DataSummary.from_data(Data({(0, ): [1, 2]}, [1, 2]))
+    b = DataSummary.from_data(Data({(0, ): [1, 2, 3]}, [1, 3]))
+    with pytest.raises(ValueError):
+        a.merge(b)
@@ -0,0 +1,108 @@
+import random
+import pytest
+
+import support
+
+support.setup_paths()
+
+from pykalibera.data import Data
+from pykalibera.warmup import changepoints, steady_state, trim_warmup
+from pykalibera.warmup import _split, _split_numpy
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# ----------------------------------
+# HELPER FIXTURES
+# ----------------------------------
+
+def sequence(levels, seed, noise=0.01):
+    """ Returns a run sequence made of (length, mean) segments """
+    rng = random.Random(seed)
+    values = []
+    for length, mean in levels:
+        values.extend(rng.gauss(mean, noise) for i in range(length))
+    return values
+
+# ----------------------------------
+# TESTS BEGIN
+# ----------------------------------
+
+def test_changepoints():
+    values = sequence([(30, 2.0), (20, 1.5), (100, 1.0)], 1)
+    assert changepoints(values) == [30, 50]
+    assert changepoints(sequence([(100, 1.0)], 2)) == []
+    # A huge penalty allows no changepoint at all.
+    assert changepoints(values, penalty=1e9) == []
+    assert changepoints([1.0, 2.0, 3.0], min_size=2) == []
+
+@pytest.mark.skipif(numpy is None, reason="numpy not installed")
+def test_split_numpy_matches_python():
+    values = sequence([(17, 3.0), (40, 1.2), (23, 1.0), (60, 1.1)], 9,
+            noise=0.05)
+    sums = [0.0]
+    for value in values:
+        sums.append(sums[-1] + value - 1.0)
+    for s, t in [(0, len(values)), (17, 80), (60, 140)]:
+        for min_size in (1, 2, 5):
+            gain, k = _split(sums, s, t, min_size)
+            np_gain, np_k = _split_numpy(numpy.array(sums), s, t, min_size)
+            assert np_k == k
+            assert np_gain == pytest.approx(gain)
+
+def test_changepoints_scaling():
+    # A short warm-up and a long steady state, the usual shape. The time
+    # taken should grow about linearly, far from quadratically.
+    import time
+    def timed(n):
+        values = sequence([(40, 2.0), (n - 40, 1.0)], 5)
+        best = None
+        for i in range(3):
+            before = time.time()
+            assert changepoints(values) == [40]
+            took = time.time() - before
+            best = took if best is None else min(best, took)
+        return best
+    small, large = timed(20000), timed(80000)
+    assert large < 8 * max(small, 1e-3)
+
+def test_steady_state():
+    assert steady_state(sequence([(30, 2.0), (20, 1.5), (100, 1.0)], 1)) \
+            == 50
+    assert steady_state(sequence([(100, 1.0)], 2)) == 0
+    # A small step within tolerance belongs to the steady state.
+    assert steady_state(sequence([(10, 3.0), (40, 1.005), (60, 1.0)], 3,
+            noise=0.001)) == 10
+    # Slowdown at the end: not long enough to be a steady state.
+    assert steady_state(sequence([(100, 1.0), (10, 2.0)], 4)) is None
+
+def test_quantised_values():
+    # A coarse timer: most consecutive values are equal.
+    rng = random.Random(1)
+    steady = [1.1 if rng.random() < 0.3 else 1.0 for i in range(200)]
+    assert changepoints(steady) == []
+    assert steady_state(steady) == 0
+    assert steady_state([2.0] * 10 + steady) == 10
+    assert steady_state([1.0] * 50) == 0
+
+    trimmed, cutoff = trim_warmup(Data({(0, ): [2.0] * 5 + steady,
+            (1, ): [2.0] * 3 + steady[::-1] + [1.0] * 2}, [2, 205]))
+    assert cutoff == 5
+
+def test_trim_warmup():
+    lists = {
+        (0, ): sequence([(5, 2.0), (45, 1.0)], 5),
+        (1, ): sequence([(8, 2.0), (42, 1.0)], 6),
+        (2, ): sequence([(50, 1.0)], 7),
+    }
+    trimmed, cutoff = trim_warmup(Data(lists, [3, 50]))
+    assert cutoff == 8
+    assert trimmed.reps == [3, 42]
+    assert trimmed[1, 0] == lists[1, ][8]
+    assert abs(trimmed.mean() - 1.0) < 0.01
+
+    lists[2, ] = sequence([(40, 1.0), (10, 3.0)], 8)
+    with pytest.raises(ValueError):
+        trim_warmup(Data(lists, [3, 50]))